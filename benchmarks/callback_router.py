@@ -0,0 +1,79 @@
+"""Time how long it takes to find the conversation of a callback query, by checking
+every conversation in turn like `Application.process_update` does, and with
+`CallbackRouter`.
+
+Run from the project root with the environment variables of the bot set:
+
+    $ python -m benchmarks.callback_router
+"""
+
+import datetime
+import timeit
+
+from telegram import CallbackQuery, Chat, Message, Update, User
+
+from src import constants
+from src.conversations import handlers
+from src.models import MaterialType
+from src.router import CallbackRouter
+
+NUMBER = 2000
+
+SAMPLES = [
+    f"{constants.NOTIFICATION_}/{MaterialType.LECTURE}/1",
+    f"{constants.REMINDER_}/{MaterialType.ASSIGNMENT}/1",
+    f"{constants.SETTINGS_}/{constants.LANGUAGE}",
+    f"{constants.SETTINGS_}/{constants.NOTIFICATIONS}",
+    f"{constants.COURSES_}/{constants.ENROLLMENTS}/1/{constants.COURSES}/2",
+    f"{constants.ENROLLMENT_}/{constants.ENROLLMENTS}/1",
+    f"{constants.UPDATE_MATERIALS_}/{constants.ENROLLMENTS}/1/{constants.COURSES}/2",
+    f"{constants.EDITOR_}/{constants.ENROLLMENTS}/1/{constants.COURSES}/2",
+    f"{constants.ACADEMICYEAR_}/{constants.ACADEMICYEARS}",
+    f"{constants.PROGRAM_}/{constants.PROGRAMS}/1",
+    f"{constants.DEPARTMENT_}/{constants.DEPARTMENTS}/1",
+    f"{constants.SEMESTER_}/{constants.SEMESTERS}",
+    f"{constants.COURSE_MANAGEMENT_}/{constants.DEPARTMENTS}",
+    f"{constants.CONETENT_MANAGEMENT_}/{constants.PROGRAMS}",
+    f"{constants.REQUEST_MANAGEMENT_}/{constants.ACCESSREQUSTS}",
+    f"{constants.USER_}/{constants.USERS}",
+    f"{constants.BROADCAST_}/run/1?a=pause",
+]
+
+
+def callback_update(data: str) -> Update:
+    user = User(1, "User", is_bot=False)
+    message = Message(1, datetime.datetime.now(datetime.UTC), Chat(1, "private"))
+    query = CallbackQuery("1", user, "1", message=message, data=data)
+    return Update(1, callback_query=query)
+
+
+def scan(update: Update):
+    """What `Application.process_update` does without the router."""
+    for handler in handlers:
+        check = handler.check_update(update)
+        if not (check is None or check is False):
+            return handler
+    return None
+
+
+def main():
+    router = CallbackRouter(handlers)
+    updates = [callback_update(data) for data in SAMPLES]
+
+    for update in updates:
+        if router.check_update(update)[0] is not scan(update):
+            raise AssertionError(
+                f"The router disagrees on {update.callback_query.data!r}"
+            )
+    matched = sum(1 for update in updates if scan(update))
+    print(f"{len(updates)} callback queries, {matched} handled by a conversation")
+
+    for name, dispatch in (("scan", scan), ("router", router.check_update)):
+        seconds = timeit.timeit(
+            lambda dispatch=dispatch: [dispatch(u) for u in updates], number=NUMBER
+        )
+        print(f"{name:>6}: {seconds / NUMBER / len(updates) * 1e6:.2f} us/update")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Time the date formatting of a deadline reminder fan-out, per message, with Babel
+and with `src.formatting`.
+
+Run from the project root with the environment variables of the bot set:
+
+    $ python -m benchmarks.formatting
+"""
+
+import timeit
+from datetime import UTC, datetime, timedelta
+from types import ModuleType
+from zoneinfo import ZoneInfo
+
+from babel import dates
+
+from src import cache, constants, formatting
+
+RECIPIENTS = 500
+NUMBER = 5
+
+DEADLINE = datetime(2026, 10, 22, 21, 59, tzinfo=UTC)
+START = DEADLINE - timedelta(hours=26, minutes=30)
+
+
+def message(module: ModuleType, now: datetime, language_code: str) -> list[str]:
+    """The formatted pieces of a reminder: the time remaining, like
+    `utils.time_remaining`, and the deadline, like
+    `messages.material_message_text`."""
+    delta = DEADLINE - now
+    seconds = delta.total_seconds()
+    return [
+        module.format_timedelta(
+            timedelta(days=seconds // (24 * 60 * 60)),
+            granularity="day",
+            format="long",
+            threshold=1,
+            locale=language_code,
+        ),
+        module.format_timedelta(
+            timedelta(hours=(seconds // (60 * 60)) % 24),
+            granularity="hours",
+            format="long",
+            threshold=1,
+            locale=language_code,
+        ),
+        module.format_timedelta(delta, locale=language_code),
+        module.format_datetime(
+            DEADLINE.astimezone(ZoneInfo("Africa/Khartoum")),
+            "E d MMM hh:mm a ZZZZ",
+            locale=language_code,
+        ),
+    ]
+
+
+def fan_out(module: ModuleType) -> list[list[str]]:
+    """A reminder sent to :data:`RECIPIENTS` users, about 30 per second."""
+    return [
+        message(
+            module,
+            START + timedelta(seconds=i / 30),
+            constants.AR if i % 2 else constants.EN,
+        )
+        for i in range(RECIPIENTS)
+    ]
+
+
+def main():
+    if fan_out(dates) != fan_out(formatting):
+        raise AssertionError("src.formatting disagrees with Babel")
+
+    for name, module in (("babel", dates), ("cached", formatting)):
+        seconds = timeit.timeit(
+            lambda module=module: (cache.formatted.clear(), fan_out(module)),
+            number=NUMBER,
+        )
+        print(f"{name:>6}: {seconds / NUMBER / RECIPIENTS * 1e6:.1f} us/message")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,15 @@
 """Setup and run a simple echo bot."""
 
+# ruff: noqa: E402
+
+import time
+
+STARTED = time.perf_counter()
+
 import logging
 
-from src import application
+from src import application, database
+from src.config import Config
 
 # Enable logging
 logging.basicConfig(
@@ -14,10 +21,40 @@ logging.getLogger("httpx").setLevel(logging.WARNING)
 logger = logging.getLogger(__name__)
 
 
+class Profile:
+    """Durations of the steps of the startup, each measured from the end of the
+    previous one."""
+
+    def __init__(self, started: float) -> None:
+        self._last = started
+        self.steps: list[tuple[str, float]] = []
+
+    def lap(self, step: str) -> None:
+        now = time.perf_counter()
+        self.steps.append((step, now - self._last))
+        self._last = now
+
+    def __str__(self) -> str:
+        total = sum(seconds for _, seconds in self.steps)
+        return " ".join(
+            f"{step}={seconds:.3f}s"
+            for step, seconds in [*self.steps, ("total", total)]
+        )
+
+
 def main() -> None:
+    profile = Profile(STARTED)
+    profile.lap("imports")
+    if Config.DB_CREATE_ALL:
+        database.create_tables()
+        profile.lap("create_tables")
     app = application.create()
+    profile.lap("create")
     application.register_handlers(app)
+    profile.lap("handlers")
     application.schedule_jobs(app)
+    profile.lap("jobs")
+    logger.info("Startup profile: %s", profile)
     application.run(app)
 
 
@@ -1,10 +1,11 @@
 """Contains wrapper functions for creating, running and register handlers
 for an application."""
 
+import hashlib
+import json
+import logging
 import os
-from datetime import time
 from typing import cast
-from zoneinfo import ZoneInfo
 
 from telegram import Chat, Update
 from telegram.ext import (
@@ -16,39 +17,155 @@ from telegram.ext import (
     filters,
 )
 
-from src import commands, constants, conversations, jobs, queries
+from src import commands, constants, conversations, jobs
 from src.config import Config, ProductionConfig
 from src.customcontext import CustomContext
-from src.database import Session
 from src.errorhandler import error_handler
-from src.persistence import SQLPersistence
+from src.ingestion import (
+    CallbackDebouncer,
+    DurableUpdateQueue,
+    KeyedUpdateProcessor,
+    UpdateWindow,
+)
+from src.leader import election, heartbeat, live_replicas
+from src.persistence import PersistentConversationHandler, SQLPersistence
+from src.ratelimiter import RateLimiter
+from src.request import Lane, LaneRequest
+from src.router import CallbackRouter
 from src.typehandler import typehandler
 
+logger = logging.getLogger(__name__)
+
+DESCRIPTIONS_KEY = "descriptions_hash"
+
+
+class SharedStateApplication(Application):
+    """Reads the state of a chat through to the database before each update and
+    writes it back right after, so replicas sharing the database can serve the
+    same chats. Used when `SHARED_STATE` is set."""
+
+    async def process_update(self, update: object) -> None:
+        persistence = cast(SQLPersistence, self.persistence)
+        if (
+            isinstance(update, Update)
+            and update.effective_chat
+            and update.effective_user
+        ):
+            await persistence.refresh_conversations(
+                update.effective_chat.id,
+                update.effective_user.id,
+                {
+                    handler.name: handler
+                    for group in self.handlers.values()
+                    for handler in group
+                    if isinstance(handler, PersistentConversationHandler)
+                    and handler.persistent
+                },
+            )
+        await super().process_update(update)
+        await self.update_persistence()
+
 
 async def post_init(application: Application):
-    """Set bot bio, description in supported locales"""
+    """Take the lease of this replica, set bot bio, description in supported
+    locales and queue the stored updates no running replica is going to
+    process.
+
+    The descriptions are only sent when they changed since the last start,
+    according to a hash kept in `bot_data`."""
+    heartbeat.acquire()
+    cast(DurableUpdateQueue, application.update_queue).restore(
+        application.bot, live_replicas()
+    )
     bot: ExtBot = application.bot
+    descriptions = []
     for language_code, translation in constants.Locales:
         _ = translation.gettext
-        await bot.set_my_description(_("Bot description"), language_code)
-        await bot.set_my_short_description(_("Bot bio"), language_code)
+        descriptions.append((language_code, _("Bot description"), _("Bot bio")))
+    digest = hashlib.sha256(json.dumps([bot.id, descriptions]).encode()).hexdigest()
+    if application.bot_data.get(DESCRIPTIONS_KEY) == digest:
+        logger.info("Bot descriptions are up to date")
+        return
+
+    for language_code, description, bio in descriptions:
+        await bot.set_my_description(description, language_code)
+        await bot.set_my_short_description(bio, language_code)
         if language_code == constants.EN:
-            await bot.set_my_description(_("Bot description"))
-            await bot.set_my_short_description(_("Bot bio"))
+            await bot.set_my_description(description)
+            await bot.set_my_short_description(bio)
+    application.bot_data[DESCRIPTIONS_KEY] = digest
+
+
+async def post_shutdown(application: Application):
+    """Give up leadership and the lease of this replica so other replicas take
+    over without waiting for them to expire, and save the highest update id
+    received"""
+    election.resign()
+    heartbeat.release()
+    window = cast(DurableUpdateQueue, application.update_queue).window
+    if window is not None:
+        window.save()
 
 
 def create() -> Application:
     """Creates an instance of `telegram.ext.Application` and configures it."""
-    persistence = SQLPersistence()
+    persistence = SQLPersistence(shared=Config.SHARED_STATE)
     context_types = ContextTypes(context=CustomContext)
-    return (
+    request = LaneRequest(
+        pool_sizes={
+            Lane.INTERACTIVE: Config.INTERACTIVE_POOL_SIZE,
+            Lane.NOTIFICATION: Config.NOTIFICATION_POOL_SIZE,
+            Lane.BULK: Config.BULK_POOL_SIZE,
+        }
+    )
+    rate_limiter = RateLimiter(
+        ack_mode=Config.ACK_MODE,
+        shed_backlog=Config.ACK_SHED_BACKLOG,
+        lane_rates={
+            Lane.INTERACTIVE: Config.INTERACTIVE_RATE,
+            Lane.NOTIFICATION: Config.NOTIFICATION_RATE,
+            Lane.BULK: Config.BULK_RATE,
+        },
+        max_retries=Config.RETRY_AFTER_MAX_RETRIES,
+    )
+    update_queue = DurableUpdateQueue(
+        maxsize=Config.UPDATE_QUEUE_SIZE,
+        durable=Config.DURABLE_UPDATE_QUEUE,
+        owner=Config.REPLICA_NAME,
+        max_age=Config.QUEUED_UPDATE_MAX_AGE,
+        window=(
+            UpdateWindow.load(Config.UPDATE_DEDUP_WINDOW)
+            if Config.UPDATE_DEDUP_WINDOW
+            else None
+        ),
+    )
+    update_processor = KeyedUpdateProcessor(
+        Config.UPDATE_WORKERS,
+        queue=update_queue,
+        debouncer=(
+            CallbackDebouncer(Config.CALLBACK_DEBOUNCE)
+            if Config.CALLBACK_DEBOUNCE
+            else None
+        ),
+    )
+    application = (
         Application.builder()
+        .application_class(
+            SharedStateApplication if Config.SHARED_STATE else Application
+        )
         .token(Config.BOT_TOKEN)
         .post_init(post_init)
+        .post_shutdown(post_shutdown)
         .context_types(context_types)
         .persistence(persistence)
+        .request(request)
+        .rate_limiter(rate_limiter)
+        .update_queue(update_queue)
+        .concurrent_updates(update_processor)
         .build()
     )
+    rate_limiter.backlog = update_processor.backlog
+    return application
 
 
 def register_handlers(application: Application):
@@ -82,6 +199,9 @@ def register_handlers(application: Application):
 
     application.add_handler(typehandler, -1)
     application.add_handlers(commands.handlers, 1)
+    # Callback queries are routed to their conversation by prefix, the rest of the
+    # updates go through the conversations in turn
+    application.add_handler(CallbackRouter(conversations.handlers), 2)
     application.add_handlers(conversations.handlers, 2)
 
     # Error Handler
@@ -91,28 +211,56 @@ def register_handlers(application: Application):
 
 def schedule_jobs(application: Application):
     job_queue = application.job_queue
-    zone = ZoneInfo("Africa/Khartoum")
-
-    # Assignment deadline reminders
-    with Session.begin() as session:
-        root = queries.user(session=session, telegram_id=Config.ROOTIDS[0])
-        if root is None:
-            return
-        for point in [
-            time(hour=6, tzinfo=zone),
-            time(hour=18, tzinfo=zone),
-        ]:
-            JOB_NAME = f"DEADLINE_REMINDER_{point}"
-            jobs.remove_job_if_exists(
-                JOB_NAME, CustomContext(application, root.chat_id, root.telegram_id)
-            )
-            job_queue.run_daily(
-                jobs.deadline_reminder,
-                point,
-                name=JOB_NAME,
-                user_id=root.telegram_id,
-                chat_id=root.chat_id,
-            )
+
+    if Config.DB_POOL_METRICS_INTERVAL:
+        job_queue.run_repeating(
+            jobs.log_pool_status,
+            interval=Config.DB_POOL_METRICS_INTERVAL,
+            name="LOG_POOL_STATUS",
+        )
+
+    window = cast(DurableUpdateQueue, application.update_queue).window
+    if window is not None:
+        job_queue.run_repeating(
+            jobs.save_update_checkpoint,
+            interval=Config.UPDATE_CHECKPOINT_INTERVAL,
+            data=window,
+            name="SAVE_UPDATE_CHECKPOINT",
+        )
+
+    job_queue.run_repeating(
+        elect, interval=Config.LEADER_ELECTION_INTERVAL, first=0, name="ELECTION"
+    )
+
+
+async def elect(context: CustomContext):
+    """Renew the lease of this replica and run a round of the leader election.
+    Start or stop the jobs that only run on the leader when the outcome changes,
+    and have the leader take over the broadcasts and stored updates of replicas
+    that stopped."""
+    heartbeat.acquire()
+    changed = election.campaign()
+    job_queue = context.job_queue
+    if changed and election.is_leader:
+        logger.info("Elected leader, starting scheduled jobs")
+        # Assignment deadline reminders
+        job_queue.run_repeating(
+            jobs.sync_deadline_reminders,
+            interval=Config.DEADLINE_REMINDER_SYNC_INTERVAL,
+            first=0,
+            name="DEADLINE_REMINDER_SYNC",
+        )
+    elif changed:
+        logger.warning("Lost leadership, stopping scheduled jobs")
+        for job in job_queue.jobs():
+            if job.name.startswith("DEADLINE_REMINDER"):
+                job.schedule_removal()
+    if election.is_leader:
+        # Broadcasts of stopped replicas, this one before a restart included
+        await conversations.broadcast.resume_runs(context.application)
+        cast(DurableUpdateQueue, context.update_queue).restore(
+            context.bot, live_replicas()
+        )
 
 
 def run(application: Application):
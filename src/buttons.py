@@ -6,12 +6,12 @@ from datetime import date, datetime, timedelta
 from typing import TYPE_CHECKING, Callable, NamedTuple, Optional, Union
 from zoneinfo import ZoneInfo
 
-from babel.dates import format_date
 from telegram import InlineKeyboardButton
 from telegram.ext import ContextTypes
 
-from src import constants
+from src import cache, constants
 from src.constants import LEVELS
+from src.formatting import format_date
 from src.models import (
     AcademicYear,
     AccessRequest,
@@ -75,6 +75,21 @@ class Buttons:
             f"Attribute `{key}` of class `{self.__class__.__name__}` can't be deleted!"
         )
 
+    def _template(self, builder: str, arguments: tuple, build: Callable[[], list]):
+        """Return what :paramref:`build` returns, memoized in `cache.keyboards`
+        under :paramref:`builder`, the language and :paramref:`arguments`, which
+        must cover everything the result depends on.
+
+        `InlineKeyboardButton` is immutable, so the buttons are shared between
+        calls, but the lists (and rows) are copied for the caller to change.
+        """
+        key = (builder, self._language_code, arguments)
+        template = cache.keyboards.get(key)
+        if template is None:
+            template = build()
+            cache.keyboards.set(key, template)
+        return [list(row) if isinstance(row, list) else row for row in template]
+
     def optional_courses(self, url: str) -> InlineKeyboardButton:
         _ = self._gettext
         return InlineKeyboardButton(
@@ -224,15 +239,23 @@ class Buttons:
         if isinstance(selected_ids, int):
             selected_ids = (selected_ids,)
         _ = self._gettext
-        return [
-            InlineKeyboardButton(
-                _("Semester")
-                + f" {semester.number}"
-                + (" ✅" if selected_ids and semester.id in selected_ids else ""),
-                callback_data=f"{url}{sep}{semester.id}",
+
+        def button(semester_id: int, number: int, selected: bool = False):
+            return InlineKeyboardButton(
+                _("Semester") + f" {number}" + (" ✅" if selected else ""),
+                callback_data=f"{url}{sep}{semester_id}",
             )
-            for semester in semesters
-        ]
+
+        numbers = [(semester.id, semester.number) for semester in semesters]
+        buttons = self._template(
+            "semester_list",
+            (url, sep, tuple(numbers)),
+            lambda: [button(*number) for number in numbers],
+        )
+        for i, number in enumerate(numbers):
+            if selected_ids and number[0] in selected_ids:
+                buttons[i] = button(*number, selected=True)
+        return buttons
 
     def program_semesters_list(
         self,
@@ -289,20 +312,24 @@ class Buttons:
                 `InlineKeyboardButton.callback_data`.
             sep (:obj:`str`): String to append  to :paramref:`url`. Defaults to `"\\"`
         """
-        buttons = []
         _ = self._gettext
-        for program_semester in program_semesters:
-            semester = program_semester.semester
-            if semester.number % 2 == 1 and program_semester.available:
-                level = (semester.number // 2 + (semester.number % 2)) - 1
-                text = _(LEVELS[level])
-                buttons.append(
-                    InlineKeyboardButton(
-                        f"{text}",
-                        callback_data=f"{url}{sep}{program_semester.id}",
-                    )
+        levels = [
+            (program_semester.id, (number // 2 + (number % 2)) - 1)
+            for program_semester in program_semesters
+            if (number := program_semester.semester.number) % 2 == 1
+            and program_semester.available
+        ]
+        return self._template(
+            "program_levels_list",
+            (url, sep, tuple(levels)),
+            lambda: [
+                InlineKeyboardButton(
+                    f"{_(LEVELS[level])}",
+                    callback_data=f"{url}{sep}{program_semester_id}",
                 )
-        return buttons
+                for program_semester_id, level in levels
+            ],
+        )
 
     def departments_list(
         self,
@@ -568,6 +595,15 @@ class Buttons:
     # TODO: add docs
     def material_groups(
         self, url: str, groups: list[MaterialType]
+    ) -> list[list[InlineKeyboardButton]]:
+        return self._template(
+            "material_groups",
+            (url, tuple(groups)),
+            lambda: self._material_groups(url, groups),
+        )
+
+    def _material_groups(
+        self, url: str, groups: list[MaterialType]
     ) -> list[list[InlineKeyboardButton]]:
         _ = self._gettext
         keyboard: list[list[InlineKeyboardButton]] = []
@@ -658,6 +694,12 @@ class Buttons:
         _ = self._gettext
         return InlineKeyboardButton(_("Disable All"), callback_data=url)
 
+    def digest(self, url: str, selected: bool):
+        _ = self._gettext
+        return InlineKeyboardButton(
+            _("Digest") + (" ✅" if selected else ""), callback_data=url
+        )
+
     def submit_proof(self, url: str):
         _ = self._gettext
         return InlineKeyboardButton(_("Submit Proof"), callback_data=url)
@@ -1031,145 +1073,181 @@ class Buttons:
 
         keyboard: list[list[InlineKeyboardButton]] = None
         date_time: datetime = None
-        _ = self._gettext
         if year and month and not day:
             currentmonth = date(year, month, 15)
-            nextmonth = currentmonth + timedelta(days=31)
-            prevmonth = currentmonth - timedelta(days=31)
-            monthcalendar = calendar.monthcalendar(year, month)
-            weekdays = [
-                _("Sun"),
-                _("Mon"),
-                _("Tue"),
-                _("Wed"),
-                _("Thu"),
-                _("Fri"),
-                _("Sat"),
-            ]
             has_next = currentmonth.month < max.month if max else True
             has_prev = (
                 currentmonth.month > min.month or currentmonth.month - 1 == today.month
                 if min
                 else True
             )
-            keyboard = build_menu(
-                [
-                    InlineKeyboardButton(
-                        _("prev-page-symbol") if has_prev else " ",
-                        callback_data=(
-                            f"{url}?y={prevmonth.year}&m={prevmonth.month}"
-                            if has_prev
-                            else f"{url}/{constants.IGNORE}"
-                        ),
-                    ),
-                    InlineKeyboardButton(
-                        format_date(currentmonth, "MMM Y", locale=self._language_code),
-                        callback_data=(
-                            f"{url}?y={year}"
-                            if min is None
-                            else f"{url}/{constants.IGNORE}"
-                        ),
+            reverse = self._language_code == constants.AR
+
+            def day_button(
+                day_: int, is_selected: bool = False, is_today: bool = False
+            ):
+                return InlineKeyboardButton(
+                    (
+                        (
+                            (emoji if is_selected else "")
+                            + (" " + "⚪️" if is_today else "")
+                            + f" {day_}"
+                        )
+                        if day_
+                        else " "
                     ),
-                    InlineKeyboardButton(
-                        _("next-page-symbol") if has_next else " ",
-                        callback_data=(
-                            f"{url}?y={nextmonth.year}&m={nextmonth.month}"
-                            if has_next
-                            else f"{url}/{constants.IGNORE}"
-                        ),
+                    callback_data=(
+                        f"{url}?y={year}&m={month}&d={day_}"
+                        if day_
+                        else f"{url}/{constants.IGNORE}"
                     ),
-                ],
-                3,
-                reverse=self._language_code == constants.AR,
+                )
+
+            keyboard = self._template(
+                "datepicker",
+                (url, year, month, has_prev, has_next, min is None),
+                lambda: self._month_grid(
+                    url, currentmonth, has_prev, has_next, min is None, day_button
+                ),
             )
-            keyboard += build_menu(
-                [
-                    InlineKeyboardButton(
-                        day,
-                        callback_data=f"{url}/{constants.IGNORE}",
+            # Only the selected days and today differ between calls
+            offset = (date(year, month, 1).weekday() - calendar.firstweekday()) % 7
+            for day_ in {
+                d.day
+                for d in (*selected_dates, today)
+                if (d.year, d.month) == (year, month)
+            }:
+                is_selected = date(year, month, day_) in selected_dates
+                is_today = date(year, month, day_) == today
+                if is_selected or is_today:
+                    week, weekday = divmod(offset + day_ - 1, 7)
+                    keyboard[2 + week][6 - weekday if reverse else weekday] = (
+                        day_button(day_, is_selected, is_today)
                     )
-                    for day in weekdays
-                ],
-                7,
-                reverse=self._language_code == constants.AR,
-            )
-            for week in monthcalendar:
-                keyboard += build_menu(
-                    [
-                        InlineKeyboardButton(
-                            (
-                                (
-                                    (
-                                        emoji
-                                        if date(year, month, day_) in selected_dates
-                                        else ""
-                                    )
-                                    + (
-                                        " " + "⚪️"
-                                        if date(year, month, day_) == today
-                                        else ""
-                                    )
-                                    + f" {day_}"
-                                )
-                                if day_
-                                else " "
-                            ),
-                            callback_data=(
-                                f"{url}?y={year}&m={month}&d={day_}"
-                                if day_
-                                else f"{url}/{constants.IGNORE}"
-                            ),
-                        )
-                        for day_ in week
-                    ],
-                    7,
-                    reverse=self._language_code == constants.AR,
-                )
         elif year and not month and not day:
-            menu = [
+            keyboard = self._template(
+                "datepicker", (url, year), lambda: self._year_grid(url, year)
+            )
+        if day:
+            date_time = datetime(year, month, day)
+        return self.Picker(keyboard=keyboard, date_time=date_time)
+
+    def _month_grid(
+        self,
+        url: str,
+        currentmonth: date,
+        has_prev: bool,
+        has_next: bool,
+        has_year: bool,
+        day_button: Callable[[int], InlineKeyboardButton],
+    ) -> list[list[InlineKeyboardButton]]:
+        """The days of :paramref:`currentmonth` for :meth:`datepicker`, none of
+        them marked."""
+        _ = self._gettext
+        year, month = currentmonth.year, currentmonth.month
+        nextmonth = currentmonth + timedelta(days=31)
+        prevmonth = currentmonth - timedelta(days=31)
+        weekdays = [
+            _("Sun"),
+            _("Mon"),
+            _("Tue"),
+            _("Wed"),
+            _("Thu"),
+            _("Fri"),
+            _("Sat"),
+        ]
+        keyboard = build_menu(
+            [
                 InlineKeyboardButton(
-                    month,
-                    callback_data=f"{url}?y={year}&m={i+1}",
-                )
-                for i, month in enumerate(
-                    [
-                        _("January"),
-                        _("February"),
-                        _("March"),
-                        _("April"),
-                        _("May"),
-                        _("June"),
-                        _("July"),
-                        _("August"),
-                        _("September"),
-                        _("October"),
-                        _("November"),
-                        _("December"),
-                    ]
-                )
-            ]
-            keyboard = build_menu(
-                [
-                    InlineKeyboardButton(
-                        _("prev-page-symbol"),
-                        callback_data=f"{url}?y={year-1}",
+                    _("prev-page-symbol") if has_prev else " ",
+                    callback_data=(
+                        f"{url}?y={prevmonth.year}&m={prevmonth.month}"
+                        if has_prev
+                        else f"{url}/{constants.IGNORE}"
                     ),
-                    InlineKeyboardButton(
-                        year,
-                        callback_data=f"{url}?y={year}&m={1}",
+                ),
+                InlineKeyboardButton(
+                    format_date(currentmonth, "MMM Y", locale=self._language_code),
+                    callback_data=(
+                        f"{url}?y={year}" if has_year else f"{url}/{constants.IGNORE}"
                     ),
-                    InlineKeyboardButton(
-                        _("next-page-symbol"),
-                        callback_data=f"{url}?y={year+1}",
+                ),
+                InlineKeyboardButton(
+                    _("next-page-symbol") if has_next else " ",
+                    callback_data=(
+                        f"{url}?y={nextmonth.year}&m={nextmonth.month}"
+                        if has_next
+                        else f"{url}/{constants.IGNORE}"
                     ),
-                ],
-                3,
+                ),
+            ],
+            3,
+            reverse=self._language_code == constants.AR,
+        )
+        keyboard += build_menu(
+            [
+                InlineKeyboardButton(
+                    day,
+                    callback_data=f"{url}/{constants.IGNORE}",
+                )
+                for day in weekdays
+            ],
+            7,
+            reverse=self._language_code == constants.AR,
+        )
+        for week in calendar.monthcalendar(year, month):
+            keyboard += build_menu(
+                [day_button(day_) for day_ in week],
+                7,
                 reverse=self._language_code == constants.AR,
             )
-            keyboard += build_menu(menu, 3, reverse=self._language_code == constants.AR)
-        if day:
-            date_time = datetime(year, month, day)
-        return self.Picker(keyboard=keyboard, date_time=date_time)
+        return keyboard
+
+    def _year_grid(self, url: str, year: int) -> list[list[InlineKeyboardButton]]:
+        """The months of :paramref:`year` for :meth:`datepicker`."""
+        _ = self._gettext
+        menu = [
+            InlineKeyboardButton(
+                month,
+                callback_data=f"{url}?y={year}&m={i+1}",
+            )
+            for i, month in enumerate(
+                [
+                    _("January"),
+                    _("February"),
+                    _("March"),
+                    _("April"),
+                    _("May"),
+                    _("June"),
+                    _("July"),
+                    _("August"),
+                    _("September"),
+                    _("October"),
+                    _("November"),
+                    _("December"),
+                ]
+            )
+        ]
+        keyboard = build_menu(
+            [
+                InlineKeyboardButton(
+                    _("prev-page-symbol"),
+                    callback_data=f"{url}?y={year-1}",
+                ),
+                InlineKeyboardButton(
+                    year,
+                    callback_data=f"{url}?y={year}&m={1}",
+                ),
+                InlineKeyboardButton(
+                    _("next-page-symbol"),
+                    callback_data=f"{url}?y={year+1}",
+                ),
+            ],
+            3,
+            reverse=self._language_code == constants.AR,
+        )
+        keyboard += build_menu(menu, 3, reverse=self._language_code == constants.AR)
+        return keyboard
 
 
 en_buttons = Buttons(constants.EN)
@@ -0,0 +1,137 @@
+"""Contains small in-process caches for query results that are read on hot paths
+but change rarely.
+
+Other replicas can't invalidate the caches of this process, so the caches of data
+they can change are disabled when `Config.SHARED_STATE` is set.
+"""
+
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from typing import Any, Generic, Optional, TypeVar
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from src.config import Config
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class LRUCache(Generic[K, V]):
+    """A bounded mapping that evicts the least recently used key once
+    :paramref:`maxsize` entries are stored.
+
+    Args:
+        maxsize (:obj:`int`): Maximum number of entries to keep.
+        enabled (:obj:`bool`, optional): Whether entries are kept at all. A disabled
+            cache is always empty.
+    """
+
+    def __init__(self, maxsize: int = 1024, enabled: bool = True) -> None:
+        if maxsize <= 0:
+            raise ValueError("maxsize must be a positive integer")
+        self.maxsize = maxsize
+        self.enabled = enabled
+        self.generation = 0
+        """Bumped whenever entries are invalidated, so a value computed from data
+        read before can be told apart, see :data:`editors`"""
+        self._data: OrderedDict[K, V] = OrderedDict()
+
+    def get(self, key: K, default: Optional[V] = None) -> Optional[V]:
+        try:
+            self._data.move_to_end(key)
+        except KeyError:
+            return default
+        return self._data[key]
+
+    def set(self, key: K, value: V) -> None:
+        if not self.enabled:
+            return
+        self._data[key] = value
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: K, default: Optional[V] = None) -> Optional[V]:
+        return self._data.pop(key, default)
+
+    def invalidate(self, predicate: Callable[[K], bool]) -> int:
+        """Remove every key for which :paramref:`predicate` returns `True`.
+
+        Returns:
+            :obj:`int`: The number of removed entries.
+        """
+        self.generation += 1
+        keys = [key for key in self._data if predicate(key)]
+        for key in keys:
+            del self._data[key]
+        return len(keys)
+
+    def clear(self) -> None:
+        self.generation += 1
+        self._data.clear()
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._data
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+editors: LRUCache[tuple[int, int, int, frozenset[int]], bool] = LRUCache(
+    maxsize=2048, enabled=not Config.SHARED_STATE
+)
+"""Results of :func:`src.queries.all_have_editors` keyed by
+``(program_id, semester_id, academic_year_id, frozenset(course_ids))``. Must be
+filled with results read from the primary database, not the replica, and only if
+:attr:`LRUCache.generation` didn't change during the read"""
+
+EDITORS_KEY = "invalidate_editors"
+"""Key of `Session.info` holding the academic years whose :data:`editors` results
+are dropped once the session commits"""
+
+
+def invalidate_editors(session: Session, academic_year_id: Optional[int] = None):
+    """Drop memoized :data:`editors` results once :paramref:`session` commits. Must
+    be called whenever an `AccessRequest` is granted, rejected or removed, with the
+    session that does it. Until the commit, a concurrent read of the primary still
+    sees the old rows, and would cache them again.
+
+    Args:
+        session (:obj:`Session`): The session of the change.
+        academic_year_id (:obj:`int`, optional): Only drop results of this
+            academic year. Drops everything when omitted.
+    """
+    session.info.setdefault(EDITORS_KEY, set()).add(academic_year_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _drop_committed_editors(session: Session) -> None:
+    academic_year_ids = session.info.pop(EDITORS_KEY, ())
+    if None in academic_year_ids:
+        editors.clear()
+    elif academic_year_ids:
+        editors.invalidate(lambda key: key[2] in academic_year_ids)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back_editors(session: Session) -> None:
+    session.info.pop(EDITORS_KEY, None)
+
+
+settings: LRUCache[int, dict[str, Any]] = LRUCache(
+    maxsize=4096, enabled=not Config.SHARED_STATE
+)
+"""Stored `Setting` rows of a user keyed by `User.id`, as a mapping of
+`Setting.key` to `Setting.value`. See :func:`src.utils.get_setting_values`"""
+
+
+keyboards: LRUCache[tuple[str, str, tuple], list] = LRUCache(maxsize=512)
+"""Keyboard templates of `src.buttons.Buttons`, keyed by
+``(builder, language_code, arguments)``. See `Buttons._template`"""
+
+
+formatted: LRUCache[tuple, str] = LRUCache(maxsize=4096)
+"""Results of the functions of `src.formatting`, keyed by the function, the value
+and its time zone, the locale and the remaining arguments"""
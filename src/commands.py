@@ -3,8 +3,9 @@ from telegram import CallbackQuery, InlineKeyboardMarkup, Update
 from telegram.constants import ParseMode
 from telegram.ext import CommandHandler
 
-from src import constants, messages, queries
+from src import cache, constants, messages, queries
 from src.customcontext import CustomContext
+from src.database import Session as DBSession
 from src.messages import bold
 from src.models import Course, RoleName, Status
 from src.utils import build_menu, roles, session
@@ -57,7 +58,7 @@ async def list_enrollments(
 
 
 @roles(RoleName.STUDENT)
-@session
+@session(read_only=True)
 async def user_course_list(update: Update, context: CustomContext, session: Session):
     """Runs with Message.text `/courses`. This is an entry point to
     `constans.COURSES_` conversation"""
@@ -108,11 +109,27 @@ async def user_course_list(update: Update, context: CustomContext, session: Sess
     reply_markup = InlineKeyboardMarkup(keyboard)
     _ = context.gettext
     message = _("Courses") + "\n\n"
-    if not queries.all_have_editors(
-        session,
-        course_ids=[u.id for u in user_courses],
-        academic_year=enrollment.academic_year,
-    ):
+    cache_key = (
+        enrollment.program.id,
+        enrollment.semester.id,
+        enrollment.academic_year_id,
+        frozenset(u.id for u in user_courses),
+    )
+    have_editors = cache.editors.get(cache_key)
+    if have_editors is None:
+        # Read from the primary, a lagging replica would cache a result
+        # `invalidate_editors` already dropped. Same for a commit that drops
+        # results while this one is read
+        generation = cache.editors.generation
+        with DBSession() as primary:
+            have_editors = queries.all_have_editors(
+                primary,
+                course_ids=[u.id for u in user_courses],
+                academic_year=enrollment.academic_year,
+            )
+        if cache.editors.generation == generation:
+            cache.editors.set(cache_key, have_editors)
+    if not have_editors:
         message += _("No editor warning {}").format(constants.COMMANDS.editor1.command)
     if query:
         await query.edit_message_text(
@@ -1,5 +1,6 @@
 import os
 import re
+import socket
 
 if os.getenv("ENV") != "production":
     from dotenv import load_dotenv
@@ -14,6 +15,13 @@ class Config:
         if os.getenv("ENV") != "production"
         else re.sub(r"^postgres", "postgresql+psycopg2", os.getenv("DATABASE_URL"))
     )
+    # Optional read replica, read-only transactions are routed to it
+    DATABASE_REPLICA_URL = (
+        re.sub(r"^postgres", "postgresql+psycopg2", url)
+        if (url := os.getenv("DATABASE_REPLICA_URL"))
+        and os.getenv("ENV") == "production"
+        else url
+    )
     ROOTIDS = tuple(
         (int(id_.strip()) for id_ in ids.split(","))
         if (ids := os.getenv("ROOTIDS"))
@@ -22,6 +30,142 @@ class Config:
     ERROR_CHANNEL_CHAT_ID = (
         int(id) if (id := os.getenv("ERROR_CHANNEL_CHAT_ID")) else None
     )
+    # private channel files of "send all" are sent to once, then copied from
+    STORAGE_CHANNEL_CHAT_ID = (
+        int(id) if (id := os.getenv("STORAGE_CHANNEL_CHAT_ID")) else None
+    )
+
+    # Update ingestion, see `src.ingestion`
+    # updates processed at the same time, those of a user are still processed in order
+    UPDATE_WORKERS = int(workers) if (workers := os.getenv("UPDATE_WORKERS")) else 1
+    # received updates waiting to be processed before the webhook holds back, 0 for
+    # no bound
+    UPDATE_QUEUE_SIZE = int(size) if (size := os.getenv("UPDATE_QUEUE_SIZE")) else 0
+    # "1" to store received updates until processed, so none are lost on restarts
+    DURABLE_UPDATE_QUEUE = os.getenv("DURABLE_UPDATE_QUEUE", "0") == "1"
+    # pressing a button again does nothing while it's processed and for this many
+    # seconds after, 0 to disable
+    CALLBACK_DEBOUNCE = (
+        float(window) if (window := os.getenv("CALLBACK_DEBOUNCE")) else 1.0
+    )
+    # recent update ids remembered to drop updates Telegram delivers again, 0 to
+    # disable
+    UPDATE_DEDUP_WINDOW = (
+        int(size) if (size := os.getenv("UPDATE_DEDUP_WINDOW")) else 1024
+    )
+    # seconds between saves of the highest update id received
+    UPDATE_CHECKPOINT_INTERVAL = (
+        float(interval)
+        if (interval := os.getenv("UPDATE_CHECKPOINT_INTERVAL"))
+        else 10.0
+    )
+    # name of this replica, unique among the running ones. Its broadcasts and
+    # unprocessed updates are taken over once its lease expires, see `src.leader`
+    REPLICA_NAME = os.getenv("REPLICA_NAME") or f"{socket.gethostname()}-{os.getpid()}"
+    # seconds after which a stored update is dropped instead of restored
+    QUEUED_UPDATE_MAX_AGE = (
+        float(age) if (age := os.getenv("QUEUED_UPDATE_MAX_AGE")) else 24 * 60 * 60.0
+    )
+
+    # Acknowledgements, see `src.ratelimiter`
+    # "await" or "background"
+    ACK_MODE = os.getenv("ACK_MODE", "await")
+    # pending updates at which bare acknowledgements are dropped, unset to never
+    ACK_SHED_BACKLOG = (
+        int(backlog) if (backlog := os.getenv("ACK_SHED_BACKLOG")) else None
+    )
+
+    # Bot API priority lanes, see `src.request`
+    INTERACTIVE_POOL_SIZE = (
+        int(size) if (size := os.getenv("INTERACTIVE_POOL_SIZE")) else 32
+    )
+    NOTIFICATION_POOL_SIZE = (
+        int(size) if (size := os.getenv("NOTIFICATION_POOL_SIZE")) else 8
+    )
+    BULK_POOL_SIZE = int(size) if (size := os.getenv("BULK_POOL_SIZE")) else 8
+    # requests per second, unset for no limit
+    INTERACTIVE_RATE = float(rate) if (rate := os.getenv("INTERACTIVE_RATE")) else None
+    NOTIFICATION_RATE = (
+        float(rate) if (rate := os.getenv("NOTIFICATION_RATE")) else 20.0
+    )
+    BULK_RATE = float(rate) if (rate := os.getenv("BULK_RATE")) else 10.0
+    # times a request is retried after Telegram's flood control kicks in
+    RETRY_AFTER_MAX_RETRIES = (
+        int(retries) if (retries := os.getenv("RETRY_AFTER_MAX_RETRIES")) else 3
+    )
+
+    # seconds between updates of a broadcast's progress message
+    BROADCAST_PROGRESS_INTERVAL = (
+        float(interval)
+        if (interval := os.getenv("BROADCAST_PROGRESS_INTERVAL"))
+        else 5.0
+    )
+    # number of chats a broadcast sends to at the same time
+    BROADCAST_CONCURRENCY = (
+        int(concurrency) if (concurrency := os.getenv("BROADCAST_CONCURRENCY")) else 8
+    )
+
+    # seconds notifications are buffered for users in digest mode
+    NOTIFICATION_DIGEST_WINDOW = (
+        float(window) if (window := os.getenv("NOTIFICATION_DIGEST_WINDOW")) else 900.0
+    )
+
+    # hours before a deadline reminders are sent, use "," to seperate them
+    DEADLINE_REMINDER_OFFSETS = tuple(
+        (float(offset.strip()) for offset in offsets.split(","))
+        if (offsets := os.getenv("DEADLINE_REMINDER_OFFSETS"))
+        else (48.0, 24.0, 2.0)
+    )
+    # seconds between rescans of upcoming deadlines by the leader
+    DEADLINE_REMINDER_SYNC_INTERVAL = (
+        float(interval)
+        if (interval := os.getenv("DEADLINE_REMINDER_SYNC_INTERVAL"))
+        else 300.0
+    )
+
+    # seconds role changes are collected before their command menus are pushed
+    COMMANDS_PUSH_DELAY = (
+        float(delay) if (delay := os.getenv("COMMANDS_PUSH_DELAY")) else 2.0
+    )
+
+    # "1" when several replicas serve the bot from the same database
+    SHARED_STATE = os.getenv("SHARED_STATE", "0") == "1"
+    # seconds between leader election rounds, see `src.leader`
+    LEADER_ELECTION_INTERVAL = (
+        float(interval) if (interval := os.getenv("LEADER_ELECTION_INTERVAL")) else 15.0
+    )
+    # seconds the leases of a replica last unless renewed by an election round
+    LEASE_TTL = (
+        float(ttl) if (ttl := os.getenv("LEASE_TTL")) else 3 * LEADER_ELECTION_INTERVAL
+    )
+
+    # Connection pool, see `src.database`
+    DB_POOL_SIZE = int(size) if (size := os.getenv("DB_POOL_SIZE")) else 5
+    DB_MAX_OVERFLOW = (
+        int(overflow) if (overflow := os.getenv("DB_MAX_OVERFLOW")) else 10
+    )
+    # seconds to wait for a free connection before giving up
+    DB_POOL_TIMEOUT = (
+        float(timeout) if (timeout := os.getenv("DB_POOL_TIMEOUT")) else 30.0
+    )
+    # seconds after which a connection is replaced, -1 to never recycle
+    DB_POOL_RECYCLE = int(recycle) if (recycle := os.getenv("DB_POOL_RECYCLE")) else -1
+    DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "0") == "1"
+    # "1" to create missing tables on start, by default outside production only
+    # where `alembic upgrade head` runs on release
+    DB_CREATE_ALL = (
+        os.getenv("DB_CREATE_ALL", "0" if os.getenv("ENV") == "production" else "1")
+        == "1"
+    )
+    # milliseconds, postgres only
+    DB_STATEMENT_TIMEOUT = (
+        int(timeout) if (timeout := os.getenv("DB_STATEMENT_TIMEOUT")) else None
+    )
+    DB_APPLICATION_NAME = os.getenv("DB_APPLICATION_NAME", "skulebot")
+    # seconds between pool metrics log lines, unset to disable
+    DB_POOL_METRICS_INTERVAL = (
+        int(interval) if (interval := os.getenv("DB_POOL_METRICS_INTERVAL")) else None
+    )
 
     @classmethod
     def validate(cls):
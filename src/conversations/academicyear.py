@@ -10,7 +10,6 @@ from telegram.constants import ParseMode
 from telegram.ext import (
     CallbackQueryHandler,
     CommandHandler,
-    ConversationHandler,
     MessageHandler,
     filters,
 )
@@ -20,6 +19,7 @@ from src.constants import ACADEMICYEAR_, ACADEMICYEARS, ADD, COMMANDS, DELETE, E
 from src.customcontext import CustomContext
 from src.messages import bold
 from src.models import AcademicYear, RoleName
+from src.persistence import PersistentConversationHandler
 from src.utils import build_menu, roles, session
 
 URLPREFIX = ACADEMICYEAR_
@@ -249,7 +249,7 @@ states.update(
     }
 )
 
-academicyear_ = ConversationHandler(
+academicyear_ = PersistentConversationHandler(
     entry_points=entry_points,
     states=states,
     fallbacks=[],
@@ -1,26 +1,51 @@
 """Contains callbacks and handlers for the /broadcast conversaion"""
 
+import asyncio
 import contextlib
+import logging
 import re
-from typing import Optional
-
-from sqlalchemy import select
-from sqlalchemy.orm import Session
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+from datetime import timedelta
+from typing import NamedTuple, Optional
+from uuid import uuid4
+
+from babel.numbers import format_decimal
+from sqlalchemy import Select, case, func, select
+from sqlalchemy.orm import Session, aliased
 from telegram import CallbackQuery, InlineKeyboardButton, InlineKeyboardMarkup, Update
-from telegram.error import Forbidden
+from telegram.error import BadRequest, Forbidden, TelegramError
 from telegram.ext import (
+    Application,
     CallbackQueryHandler,
     CommandHandler,
-    ConversationHandler,
+    JobQueue,
     MessageHandler,
     filters,
 )
 
-from src import constants, jobs, queries
+from src import constants, queries
+from src.config import Config
 from src.constants import COMMANDS
 from src.customcontext import CustomContext
-from src.models import Enrollment, RoleName, User
-from src.utils import build_menu, roles, session
+from src.database import Session as DBSession
+from src.enum import StringEnum
+from src.formatting import format_timedelta
+from src.leader import LeaseLock, lease
+from src.models import (
+    AccessRequest,
+    Enrollment,
+    ProgramSemester,
+    RoleName,
+    Semester,
+    Status,
+    User,
+)
+from src.persistence import PersistentConversationHandler
+from src.utils import build_menu, mark_unreachable, roles, session
+
+logger = logging.getLogger(__name__)
 
 URLPREFIX = constants.BROADCAST_
 """used as a prefix for all `callback data` in this conversation"""
@@ -28,6 +53,9 @@ URLPREFIX = constants.BROADCAST_
 DATA_KEY = constants.BROADCAST_
 """used as a key for read/wirte operations on `chat_data`, `user_data`, `bot_data`"""
 
+BATCH_SIZE = 500
+"""Number of recipients loaded at a time by `send_run`"""
+
 
 # ------------------------------- entry_points ---------------------------
 @roles(RoleName.ROOT)
@@ -222,13 +250,8 @@ async def broadcast_options(update: Update, context: CustomContext):
     await query.answer()
 
     url = context.match.group()
-    target = context.match.group("target")
     _ = context.gettext
 
-    if target == "missing":
-        await update.effective_message.reply_text("This is currently not implemented!")
-        return constants.ONE
-
     keyboard = build_menu(
         [
             InlineKeyboardButton(
@@ -250,7 +273,6 @@ async def broadcast_options(update: Update, context: CustomContext):
     message = _("Select action")
     reply_markup = InlineKeyboardMarkup(keyboard)
     await query.edit_message_text(message, reply_markup=reply_markup)
-    return None
 
 
 @session
@@ -280,8 +302,169 @@ async def action(update: Update, context: CustomContext, session: Session):
             )
         return
 
+    total = session.scalar(
+        select(func.count()).select_from(audience(session, target).subquery())
+    )
+    if total == 0:
+        _ = context.gettext
+        await query.edit_message_text(_("Done! No users to broadcast to"))
+        return
+
+    ar_message_id = context.chat_data[DATA_KEY].get("ar_message_id")
+    en_message_id = context.chat_data[DATA_KEY].get("en_message_id")
+    run = BroadcastRun(
+        id=uuid4().hex[:8],
+        chat_id=update.effective_chat.id,
+        user_id=update.effective_user.id,
+        target=target,
+        option=option,
+        message_ids={
+            constants.AR: ar_message_id if has_arabic else en_message_id,
+            constants.EN: en_message_id if has_english else ar_message_id,
+        },
+        progress_message_id=query.message.message_id,
+        total=total,
+    )
+    run.save(context.bot_data)
+    await report_progress(context, run)
+    start_run(context.job_queue, run)
+
+
+@roles(RoleName.ROOT)
+async def run_control(update: Update, context: CustomContext):
+    """Runs on callback_data
+    `^{URLPREFIX}/run/(?P<run_id>\w+)\?a=(?P<run_action>pause|resume|cancel)$`"""
+
+    query = update.callback_query
+    await query.answer()
+
+    run = BroadcastRun.get(context.bot_data, context.match.group("run_id"))
+    if run is None:
+        # The run has already finished
+        await query.edit_message_reply_markup(None)
+        return
+
+    run_action = context.match.group("run_action")
+    if run_action == "pause" and run.status == RunStatus.RUNNING:
+        run.status = RunStatus.PAUSED
+    elif run_action == "resume" and run.status == RunStatus.PAUSED:
+        run.status = RunStatus.RUNNING
+    elif run_action == "cancel" and run.status != RunStatus.DONE:
+        run.status = RunStatus.CANCELLED
+    run.save(context.bot_data)
+
+    if run.id in _active_runs or run_lease(run.id).held():
+        # `send_run` picks up the status before the next message and reports it,
+        # on whichever replica is sending
+        return
+    if run.status == RunStatus.RUNNING:
+        start_run(context.job_queue, run)
+        return
+    await report_progress(context, run)
+    if run.status == RunStatus.CANCELLED:
+        run.delete(context.bot_data)
+
+
+# ---------------------------------- runs ----------------------------------
+
+
+class RunStatus(StringEnum):
+    RUNNING = "running"
+    PAUSED = "paused"
+    CANCELLED = "cancelled"
+    DONE = "done"
+
+
+@dataclass
+class BroadcastRun:
+    """A broadcast from the chat :attr:`chat_id` to the users of :attr:`target`.
+
+    Runs are stored in `bot_data[DATA_KEY]` so they are persisted with the rest of
+    `bot_data`, and users are sent to in order of `User.id`, so a run continues
+    after the last recipient handled (:attr:`cursor`) when it's resumed, or when
+    it's taken over after the replica sending it stopped, see :func:`resume_runs`.
+    The replica sending a run holds its :func:`run_lease`.
+    """
+
+    id: str
+    chat_id: int
+    user_id: int
+    target: str
+    option: str
+    message_ids: dict[str, int]
+    """The message to copy for each language code"""
+    progress_message_id: int
+    total: int
+    status: RunStatus = RunStatus.RUNNING
+    cursor: int = 0
+    """`User.id` of the last recipient handled"""
+    sent: int = 0
+    failed: int = 0
+    blocked: int = 0
+    elapsed: float = 0.0
+    """Seconds spent sending, pauses excluded"""
+
+    def __post_init__(self):
+        self.status = RunStatus(self.status)
+
+    @property
+    def handled(self) -> int:
+        return self.sent + self.failed + self.blocked
+
+    @property
+    def throughput(self) -> float:
+        """Messages per second"""
+        return self.handled / self.elapsed if self.elapsed else 0.0
+
+    @classmethod
+    def get(cls, bot_data: dict, run_id: str) -> Optional["BroadcastRun"]:
+        data = bot_data.get(DATA_KEY, {}).get(run_id)
+        return cls(**data) if data else None
+
+    @classmethod
+    def all(cls, bot_data: dict) -> list["BroadcastRun"]:
+        return [cls(**data) for data in bot_data.get(DATA_KEY, {}).values()]
+
+    def save(self, bot_data: dict) -> None:
+        bot_data.setdefault(DATA_KEY, {})[self.id] = asdict(self)
+
+    def sync(self, bot_data: dict) -> None:
+        """Save the progress, keeping a status set from :func:`run_control` in the
+        meantime."""
+        if stored := bot_data.get(DATA_KEY, {}).get(self.id):
+            self.status = RunStatus(stored["status"])
+        self.save(bot_data)
+
+    def delete(self, bot_data: dict) -> None:
+        bot_data.get(DATA_KEY, {}).pop(self.id, None)
+
+
+_active_runs: set[str] = set()
+"""Ids of the runs `send_run` is currently sending on this replica, see
+:func:`run_lease` for the others"""
+
+
+def run_lease(run_id: str) -> LeaseLock:
+    """Taken by :func:`start_run` and held while the run is sent, so only one
+    replica ever sends it. It expires when that replica stops."""
+    return lease(f"broadcast/{run_id}")
+
+
+class Recipient(NamedTuple):
+    """The columns of `User` needed to send a broadcast, loaded instead of whole
+    `User` objects to keep the memory use of a run small."""
+
+    id: int
+    telegram_id: int
+    chat_id: int
+    language_code: str
+
+
+def audience(session: Session, target: str) -> Select[tuple[int, int, int, str]]:
+    """The :class:`Recipient` columns of the users a broadcast to :paramref:`target`
+    is sent to, ordered by `User.id`."""
+    recipients = select(User.id, User.telegram_id, User.chat_id, User.language_code)
     most_recent = queries.academic_year(session, most_recent=True)
-    users = []
     if target.isnumeric():
         program_semester = queries.program_semester(session, target)
         level = program_semester.semester.number // 2 + (
@@ -290,140 +473,271 @@ async def action(update: Update, context: CustomContext, session: Session):
         program_semesters = queries.program_semesters(
             session, program_semester.program.id, level=level
         )
-        users = session.scalars(
-            select(User)
-            .select_from(Enrollment)
+        statement = (
+            recipients.select_from(Enrollment)
             .join(User)
             .filter(
                 Enrollment.program_semester_id.in_([ps.id for ps in program_semesters]),
                 Enrollment.academic_year_id == most_recent.id,
             )
-        ).all()
+        )
     elif target == "recently_enrolled":
-        users = session.scalars(
-            select(User)
-            .select_from(Enrollment)
+        statement = (
+            recipients.select_from(Enrollment)
             .join(User)
             .filter(
                 Enrollment.academic_year_id == most_recent.id,
             )
-        ).all()
+        )
     elif target == "all_users":
-        users = session.scalars(select(User)).all()
+        statement = recipients
     elif target == "missing":
-        # TODO: Missing right now
-        # program_semester_1 = aliased(ProgramSemester)
-        # ids = session.scalars(
-        #     select(program_semester_1.id)
-        #     .select_from(Enrollment)
-        #     .join(ProgramSemester)
-        #     .join(Semester)
-        #     .join(
-        #         program_semester_1,
-        #         and_(
-        #             program_semester_1.program_id == ProgramSemester.program_id,
-        #             program_semester_1.semester_id.in_(
-        #                 [
-        #                     Semester.number,
-        #                     Semester.number
-        #                     + case((Semester.number % 2 == 0, -1), else_=1),
-        #                 ]
-        #             ),
-        #         ),
-        #     )
-        #     .join(AccessRequest)
-        #     .filter(
-        #         AccessRequest.status == Status.GRANTED,
-        #         Enrollment.academic_year_id == most_recent.id,
-        #     )
-        #     .distinct(program_semester_1.id)
-        # ).all()
-        # users = session.scalars(
-        #     select(User)
-        #     .select_from(Enrollment)
-        #     .join(User)
-        #     .filter(
-        #         Enrollment.academic_year_id == most_recent.id,
-        #         Enrollment.program_semester_id.not_in(ids),
-        #     )
-        # ).all()
-        pass
-
-    success = await query.delete_message()
-    if success:
-        session.expunge_all()
-        for i, user in enumerate(users):
-            JOBNAME = (
-                str(context.user_data["telegram_id"])
-                + "_BROADCAST_TO_"
-                + str(user.telegram_id)
+        # Students whose level in their program has no editor: no granted access
+        # request in the same program and semester pair this academic year
+        editor_enrollment = aliased(Enrollment)
+        editor_program_semester = aliased(ProgramSemester)
+        editor_semester = aliased(Semester)
+        has_editor = (
+            select(AccessRequest.id)
+            .join(
+                editor_enrollment, AccessRequest.enrollment_id == editor_enrollment.id
             )
-            jobs.remove_job_if_exists(JOBNAME, context)
-
-            is_last = i == len(users) - 1
-            is_first = i == 0
-            when = i * 2
-            context.job_queue.run_once(
-                send_message,
-                when=when,
-                name=JOBNAME,
-                data={
-                    "user": user,
-                    "option": option,
-                    "is_last": is_last,
-                    "is_first": is_first,
-                    "has_arabic": has_arabic,
-                    "has_english": has_english,
-                },
-                chat_id=update.effective_chat.id,
-                user_id=update.effective_user.id,
+            .join(
+                editor_program_semester,
+                editor_enrollment.program_semester_id == editor_program_semester.id,
             )
-
-        if len(users) == 0:
-            _ = context.gettext
-            await context.bot.send_message(
-                update.effective_chat.id, _("Done! No users to broadcast to")
+            .join(
+                editor_semester,
+                editor_program_semester.semester_id == editor_semester.id,
+            )
+            .where(
+                AccessRequest.status == Status.GRANTED,
+                editor_enrollment.academic_year_id == Enrollment.academic_year_id,
+                editor_program_semester.program_id == ProgramSemester.program_id,
+                editor_semester.number.in_(
+                    [
+                        Semester.number,
+                        Semester.number + case((Semester.number % 2 == 0, -1), else_=1),
+                    ]
+                ),
+            )
+            .exists()
+        )
+        statement = (
+            recipients.select_from(Enrollment)
+            .join(User)
+            .join(ProgramSemester)
+            .join(Semester)
+            .filter(
+                Enrollment.academic_year_id == most_recent.id,
+                ~has_editor,
             )
+        )
+    else:
+        raise ValueError(f"unknown broadcast target {target!r}")
+    return statement.where(User.unreachable_since.is_(None)).order_by(User.id)
+
+
+def start_run(job_queue: JobQueue, run: BroadcastRun) -> bool:
+    """Send :paramref:`run` from this replica, unless another one holds its
+    :func:`run_lease`.
 
+    Returns:
+        :obj:`bool`: Whether the run was started.
+    """
+    if not run_lease(run.id).acquire():
+        return False
+    job_queue.run_once(
+        send_run,
+        when=0,
+        name=f"BROADCAST_{run.id}",
+        data=run.id,
+        chat_id=run.chat_id,
+        user_id=run.user_id,
+    )
+    return True
 
-async def send_message(context: CustomContext) -> None:
-    """Broadcast the message."""
-    job = context.job
 
-    user: User = job.data["user"]
-    option: str = job.data["option"]
-    has_arabic: bool = job.data["has_arabic"]
-    has_english: bool = job.data["has_english"]
-    is_first: bool = job.data["is_first"]
-    is_last: bool = job.data["is_last"]
+async def resume_runs(application: Application) -> None:
+    """Restart the runs that were sending on a replica that stopped since, once
+    their lease expired. Must be called after `bot_data` is loaded from
+    persistence."""
+    if application.persistence is not None:
+        await application.persistence.refresh_bot_data(application.bot_data)
+    for run in BroadcastRun.all(application.bot_data):
+        if run.status == RunStatus.RUNNING and run.id not in _active_runs:
+            start_run(application.job_queue, run)
 
-    if is_first:
+
+async def send_run(context: CustomContext) -> None:
+    """Broadcast the message of a run until it's done, paused or cancelled, or
+    until another replica took over its lease."""
+    if context.job.data in _active_runs:
+        return
+    lease_ = run_lease(context.job.data)
+    if not lease_.acquire():
+        # Taken over by another replica since it was started
+        return
+    # The progress as last saved, by whichever replica sent it before
+    await refresh_bot_data(context)
+    run = BroadcastRun.get(context.bot_data, context.job.data)
+    if run is None:
+        lease_.release()
+        return
+
+    _active_runs.add(run.id)
+    reported_at = renewed_at = time.monotonic()
+    recipients: deque[Recipient] = deque()
+    try:
+        while True:
+            if time.monotonic() - renewed_at >= Config.LEASE_TTL / 3:
+                if not lease_.acquire():
+                    logger.warning("Broadcast %s was taken over, stopping", run.id)
+                    return
+                renewed_at = time.monotonic()
+            # Pick up a status set from `run_control` on another replica
+            await refresh_bot_data(context)
+            run.sync(context.bot_data)
+            if run.status != RunStatus.RUNNING:
+                break
+            if not recipients:
+                with DBSession(info={"read_only": True}) as session:
+                    recipients.extend(
+                        Recipient._make(row)
+                        for row in session.execute(
+                            audience(session, run.target)
+                            .where(User.id > run.cursor)
+                            .limit(BATCH_SIZE)
+                        )
+                    )
+                if not recipients:
+                    run.status = RunStatus.DONE
+                    run.save(context.bot_data)
+                    break
+
+            # Chats are sent to concurrently, each one's copy and pin in order
+            window = [
+                recipients.popleft()
+                for _ in range(min(Config.BROADCAST_CONCURRENCY, len(recipients)))
+            ]
+            started_at = time.monotonic()
+            await asyncio.gather(
+                *(send_message(context, run, recipient) for recipient in window)
+            )
+            run.elapsed += time.monotonic() - started_at
+            run.cursor = window[-1].id
+
+            if time.monotonic() - reported_at >= Config.BROADCAST_PROGRESS_INTERVAL:
+                await refresh_bot_data(context)
+                run.sync(context.bot_data)
+                await report_progress(context, run)
+                # checkpoint the cursor
+                await context.application.update_persistence()
+                reported_at = time.monotonic()
+    finally:
+        _active_runs.discard(run.id)
+        lease_.release()
+
+    await report_progress(context, run)
+    if run.status == RunStatus.DONE:
+        # Edits are silent, so notify the admin with a new message
         await context.bot.send_message(
-            job.chat_id, text=context.gettext("Started Broadcasting the message")
+            run.chat_id,
+            text=context.gettext("Done broadcasting message"),
+            reply_to_message_id=run.progress_message_id,
         )
+    if run.status in (RunStatus.DONE, RunStatus.CANCELLED):
+        run.delete(context.bot_data)
+    await context.application.update_persistence()
+
+
+async def refresh_bot_data(context: CustomContext) -> None:
+    """Read `bot_data` again if another replica changed it, see
+    `SQLPersistence.refresh_bot_data`."""
+    if context.application.persistence is not None:
+        await context.application.persistence.refresh_bot_data(context.bot_data)
+
 
-    message_id = None
-    if user.language_code == constants.EN:
-        if has_english:
-            message_id = context.chat_data[DATA_KEY]["en_message_id"]
-        else:
-            message_id = context.chat_data[DATA_KEY]["ar_message_id"]
-    elif user.language_code == constants.AR:
-        if has_arabic:
-            message_id = context.chat_data[DATA_KEY]["ar_message_id"]
-        else:
-            message_id = context.chat_data[DATA_KEY]["en_message_id"]
-
-    with contextlib.suppress(Forbidden):
+async def send_message(
+    context: CustomContext, run: BroadcastRun, recipient: Recipient
+) -> None:
+    """Copy the message of :paramref:`run` to :paramref:`recipient` and count the
+    outcome."""
+    message_id = run.message_ids.get(
+        recipient.language_code, run.message_ids[constants.EN]
+    )
+    try:
         message = await context.bot.copy_message(
-            user.chat_id, from_chat_id=job.chat_id, message_id=message_id
+            recipient.chat_id, from_chat_id=run.chat_id, message_id=message_id
+        )
+        if run.option == "pin":
+            await context.bot.pin_chat_message(recipient.chat_id, message.message_id)
+    except Forbidden:
+        run.blocked += 1
+        with DBSession.begin() as session:
+            mark_unreachable(session, recipient.id)
+    except TelegramError as error:
+        run.failed += 1
+        logger.warning(
+            "Broadcast %s to %s failed: %s", run.id, recipient.chat_id, error
         )
-        if option == "pin":
-            await context.bot.pin_chat_message(user.chat_id, message.message_id)
+    else:
+        run.sent += 1
 
-    if is_last:
-        await context.bot.send_message(
-            job.chat_id, text=context.gettext("Done broadcasting message")
+
+async def report_progress(context: CustomContext, run: BroadcastRun) -> None:
+    """Edit the progress message of :paramref:`run` in place."""
+    _ = context.gettext
+    status = {
+        RunStatus.RUNNING: _("Broadcasting the message"),
+        RunStatus.PAUSED: _("Broadcast paused"),
+        RunStatus.CANCELLED: _("Broadcast cancelled"),
+        RunStatus.DONE: _("Done broadcasting message"),
+    }[run.status]
+    lines = [
+        f"📣 {status}",
+        "",
+        _("Sent: {} of {}").format(run.sent, run.total),
+        _("Failed: {}").format(run.failed),
+        _("Blocked: {}").format(run.blocked),
+        _("{} messages per second").format(
+            format_decimal(run.throughput, "0.#", locale=context.language_code)
+        ),
+    ]
+    if run.status == RunStatus.RUNNING and run.throughput:
+        remaining = max(run.total - run.handled, 0) / run.throughput
+        lines.append(
+            _("About {} remaining").format(
+                format_timedelta(
+                    timedelta(seconds=remaining), locale=context.language_code
+                )
+            )
+        )
+
+    url = f"{URLPREFIX}/run/{run.id}"
+    keyboard = []
+    if run.status == RunStatus.RUNNING:
+        keyboard = [
+            [
+                InlineKeyboardButton(_("Pause"), callback_data=f"{url}?a=pause"),
+                InlineKeyboardButton(_("Cancel"), callback_data=f"{url}?a=cancel"),
+            ]
+        ]
+    elif run.status == RunStatus.PAUSED:
+        keyboard = [
+            [
+                InlineKeyboardButton(_("Resume"), callback_data=f"{url}?a=resume"),
+                InlineKeyboardButton(_("Cancel"), callback_data=f"{url}?a=cancel"),
+            ]
+        ]
+
+    # e.g. "Message is not modified" when nothing was sent since the last report
+    with contextlib.suppress(BadRequest):
+        await context.bot.edit_message_text(
+            "\n".join(lines),
+            chat_id=run.chat_id,
+            message_id=run.progress_message_id,
+            reply_markup=InlineKeyboardMarkup(keyboard),
         )
 
 
@@ -432,6 +746,11 @@ async def send_message(context: CustomContext) -> None:
 cmd = COMMANDS
 entry_points = [
     CommandHandler(cmd.broadcast.command, broadcast),
+    CallbackQueryHandler(
+        run_control,
+        pattern=f"^{URLPREFIX}/run/(?P<run_id>\w+)"
+        "\?a=(?P<run_action>pause|resume|cancel)$",
+    ),
     CallbackQueryHandler(
         broadcast,
         pattern=f"^{URLPREFIX}/{constants.LANGUAGE}\?ar=(?P<has_arabic>0|1)&en=(?P<has_english>0|1)$",
@@ -474,7 +793,7 @@ states.update(
     }
 )
 
-broadcast_ = ConversationHandler(
+broadcast_ = PersistentConversationHandler(
     entry_points=entry_points,
     states=states,
     fallbacks=[],
@@ -1,13 +1,14 @@
 from sqlalchemy.orm import Session
 from telegram import CallbackQuery, InlineKeyboardMarkup, Update
 from telegram.constants import ParseMode
-from telegram.ext import CallbackQueryHandler, CommandHandler, ConversationHandler
+from telegram.ext import CallbackQueryHandler, CommandHandler
 
 from src import constants, queries
 from src.conversations.updatematerial import updatematerials_
 from src.customcontext import CustomContext
 from src.messages import underline
 from src.models import RoleName
+from src.persistence import PersistentConversationHandler
 from src.utils import build_menu, roles, session
 
 URLPREFIX = constants.CONETENT_MANAGEMENT_
@@ -197,7 +198,7 @@ states = {
 }
 
 
-contentmanagement_ = ConversationHandler(
+contentmanagement_ = PersistentConversationHandler(
     entry_points=entry_points,
     states=states,
     fallbacks=[],
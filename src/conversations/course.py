@@ -2,16 +2,16 @@ import re
 from datetime import UTC, datetime
 from zoneinfo import ZoneInfo
 
-from babel.dates import format_datetime
 from sqlalchemy import and_, select, text
 from sqlalchemy.orm import Session
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
 from telegram.constants import ParseMode
-from telegram.ext import CallbackQueryHandler, ConversationHandler
+from telegram.ext import CallbackQueryHandler
 
 from src import commands, constants, messages, queries
 from src.conversations.material import files, material, sendall
 from src.customcontext import CustomContext
+from src.formatting import format_datetime
 from src.models import (
     Assignment,
     MaterialType,
@@ -19,12 +19,13 @@ from src.models import (
     Semester,
     UserOptionalCourse,
 )
+from src.persistence import PersistentConversationHandler
 from src.utils import build_menu, session, time_remaining
 
 # ------------------------------- entry_points ---------------------------
 
 
-@session
+@session(read_only=True)
 async def course(update: Update, context: CustomContext, session: Session):
     """
     Runs on callback_data `{PREFIX}/{constants.COURSES}/(?P<course_id>\d+)$`
@@ -84,7 +85,7 @@ async def course(update: Update, context: CustomContext, session: Session):
     return constants.ONE
 
 
-@session
+@session(read_only=True)
 async def deadlines(update: Update, context: CustomContext, session: Session):
     """
     Runs on callback_data `{PREFIX}/{constants.COURSES}/(?P<course_id>\d+)$`
@@ -192,7 +193,7 @@ async def deadlines(update: Update, context: CustomContext, session: Session):
     return constants.ONE
 
 
-@session
+@session(read_only=True)
 async def assignments(update: Update, context: CustomContext, session: Session):
     """
     Runs on callback_data `{PREFIX}/{constants.COURSES}/(?P<course_id>\d+)$`
@@ -422,7 +423,7 @@ states = {
 }
 
 
-usercourses_ = ConversationHandler(
+usercourses_ = PersistentConversationHandler(
     entry_points=entry_points,
     states=states,
     fallbacks=[],
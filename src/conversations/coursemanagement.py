@@ -6,7 +6,6 @@ from telegram.constants import ParseMode
 from telegram.ext import (
     CallbackQueryHandler,
     CommandHandler,
-    ConversationHandler,
     MessageHandler,
     filters,
 )
@@ -15,6 +14,7 @@ from src import constants, queries
 from src.customcontext import CustomContext
 from src.messages import bold, underline
 from src.models import Course, RoleName
+from src.persistence import PersistentConversationHandler
 from src.utils import Pager, build_menu, roles, session
 
 URLPREFIX = constants.COURSE_MANAGEMENT_
@@ -599,7 +599,7 @@ states.update(
     }
 )
 
-coursemanagement_ = ConversationHandler(
+coursemanagement_ = PersistentConversationHandler(
     entry_points=entry_points,
     states=states,
     fallbacks=[],
@@ -6,7 +6,6 @@ from telegram.constants import ParseMode
 from telegram.ext import (
     CallbackQueryHandler,
     CommandHandler,
-    ConversationHandler,
     MessageHandler,
     filters,
 )
@@ -15,6 +14,7 @@ from src import constants, queries
 from src.customcontext import CustomContext
 from src.messages import bold
 from src.models import Department, RoleName
+from src.persistence import PersistentConversationHandler
 from src.utils import build_menu, roles, session
 
 URLPREFIX = constants.DEPARTMENT_
@@ -303,7 +303,7 @@ states.update(
     }
 )
 
-department_ = ConversationHandler(
+department_ = PersistentConversationHandler(
     entry_points=entry_points,
     states=states,
     fallbacks=[],
@@ -8,18 +8,18 @@ from telegram.constants import ParseMode
 from telegram.ext import (
     CallbackQueryHandler,
     CommandHandler,
-    ConversationHandler,
     MessageHandler,
     filters,
 )
 
-from src import constants, messages, queries
+from src import cache, constants, jobs, messages, queries
 from src.config import Config
 from src.conversations.updatematerial import updatematerials_
 from src.customcontext import CustomContext
 from src.messages import bold, underline
 from src.models import AccessRequest, Course, File, RoleName, Status
-from src.utils import build_menu, roles, session, set_my_commands
+from src.persistence import PersistentConversationHandler
+from src.utils import build_menu, roles, session
 
 # ------------------------- Callbacks -----------------------------
 
@@ -258,6 +258,7 @@ async def access(update: Update, context: CustomContext, session: Session) -> No
             session, program_semester_id=edit_p_s_id
         )
         session.flush()
+        cache.invalidate_editors(session, enrollment.academic_year_id)
         await query.answer()
 
     user_courses = queries.user_courses(
@@ -357,6 +358,7 @@ async def revoke_access(update: Update, context: CustomContext, session: Session
     elif has_confirmed == "1":
         del enrollment.access_request
         session.flush()
+        cache.invalidate_editors(session, enrollment.academic_year_id)
         user = enrollment.user
         has_granted_accessess = len(
             [
@@ -368,7 +370,7 @@ async def revoke_access(update: Update, context: CustomContext, session: Session
         )
         if not has_granted_accessess:
             user.roles.remove(queries.role(session, role_name=RoleName.EDITOR))
-            await set_my_commands(context.bot, user)
+            jobs.queue_commands(context.job_queue, user)
         menu_buttons = [
             context.buttons.back(
                 url, text=_("Editor Access"), pattern=rf"/{constants.ENROLLMENTS}.*"
@@ -430,7 +432,7 @@ states.update(
     }
 )
 
-editor_ = ConversationHandler(
+editor_ = PersistentConversationHandler(
     entry_points=entry_points,
     states=states,
     fallbacks=[],
@@ -7,13 +7,14 @@ from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from telegram import InlineKeyboardMarkup, Update, error
 from telegram.constants import ParseMode
-from telegram.ext import CallbackQueryHandler, ConversationHandler
+from telegram.ext import CallbackQueryHandler
 
-from src import commands, constants, messages, queries
+from src import cache, commands, constants, messages, queries
 from src.conversations.course import usercourses_
 from src.customcontext import CustomContext
 from src.messages import bold
 from src.models import Course, Enrollment, RoleName, Status
+from src.persistence import PersistentConversationHandler
 from src.utils import build_menu, session, set_my_commands
 
 # ------------------------- Callbacks -----------------------------
@@ -149,6 +150,7 @@ async def enrollment(
         )
         enrollment_obj.program_semester = pair_program_semester
         session.flush()
+        cache.invalidate_editors(session, enrollment_obj.academic_year_id)
         await query.answer()
 
     await query.answer()
@@ -242,6 +244,7 @@ async def enrollment_delete(update: Update, context: CustomContext, session: Ses
     elif has_confirmed == "1":
         user = enrollment.user
         session.delete(enrollment)
+        cache.invalidate_editors(session, enrollment.academic_year_id)
         granted_accessess = [
             e
             for e in user.enrollments
@@ -251,10 +254,9 @@ async def enrollment_delete(update: Update, context: CustomContext, session: Ses
             r.name for r in user.roles
         ]:
             user.roles.remove(queries.role(session, RoleName.EDITOR))
-            await set_my_commands(context.bot, user)
         if len(user.enrollments) == 0:
             user.roles.remove(queries.role(session, RoleName.STUDENT))
-            await set_my_commands(context.bot, user)
+        await set_my_commands(context.bot, user)
         menu_buttons = [
             context.buttons.back(
                 url, text=_("Your enrollments"), pattern=rf"/{constants.ENROLLMENTS}.*"
@@ -304,7 +306,7 @@ states = {
     ]
 }
 
-enrolments_ = ConversationHandler(
+enrolments_ = PersistentConversationHandler(
     entry_points=entry_points,
     states=states,
     fallbacks=[],
@@ -2,13 +2,14 @@ import re
 from datetime import datetime, timedelta, timezone
 from zoneinfo import ZoneInfo
 
-from babel.dates import format_date, format_datetime
 from sqlalchemy.orm import Session
 from telegram import InlineKeyboardMarkup, Update
 from telegram.constants import ParseMode
 
-from src import constants, messages
+from src import constants, jobs, messages
+from src.config import Config
 from src.customcontext import CustomContext
+from src.formatting import format_date, format_datetime
 from src.models import Assignment
 from src.utils import session
 
@@ -101,6 +102,7 @@ async def receive_time(update: Update, context: CustomContext, session: Session)
 
     if update.message.text == "/empty":
         material.deadline = None
+        jobs.schedule_deadline_reminders(context.job_queue, material)
         message = _("Success! {} removed").format(_("Deadline"))
         await update.message.reply_text(message, reply_markup=reply_markup)
         return constants.ONE
@@ -115,16 +117,13 @@ async def receive_time(update: Update, context: CustomContext, session: Session)
 
     d = datetime(year, month, day, hour, minute, tzinfo=ZoneInfo("Africa/Khartoum"))
     material.deadline = d.astimezone(timezone.utc)
+    jobs.schedule_deadline_reminders(context.job_queue, material)
 
     message = _("Success! Deadline set {}").format(
         format_datetime(d, "E d MMM hh:mm a ZZZZ", locale=context.language_code)
     )
-    now = datetime.now(ZoneInfo("Africa/Khartoum"))
-    if now.hour < 6:
-        next_run = now.replace(hour=6, minute=0, second=0, microsecond=0)
-    else:
-        next_run = now.replace(hour=18, minute=0, second=0, microsecond=0)
-    if d >= next_run + timedelta(hours=36):
+    last_reminder = d - timedelta(hours=min(Config.DEADLINE_REMINDER_OFFSETS))
+    if last_reminder > datetime.now(ZoneInfo("Africa/Khartoum")):
         note = _("Success! Deadline reminder set")
         message += "\n" + note
     await update.message.reply_text(
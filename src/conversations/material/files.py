@@ -12,7 +12,7 @@ from src.models.material import get_material_class
 from src.utils import build_menu, session, user_mode
 
 
-@session
+@session(read_only=True)
 async def file(update: Update, context: CustomContext, session: Session):
     """
     Runs on callback_data
@@ -93,7 +93,7 @@ async def delete(
     return await back.__wrapped__(update, context, session)
 
 
-@session
+@session(read_only=True)
 async def display(
     update: Update, context: CustomContext, session: Session, file_id=None
 ):
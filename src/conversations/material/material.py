@@ -39,7 +39,6 @@ from telegram import InlineKeyboardMarkup, Update
 from telegram.constants import ParseMode
 from telegram.ext import (
     CallbackQueryHandler,
-    ConversationHandler,
     MessageHandler,
     filters,
 )
@@ -70,11 +69,12 @@ from src.models import (
     SingleFile,
 )
 from src.models.material import get_material_class
+from src.persistence import PersistentConversationHandler
 from src.utils import build_menu, session, user_mode
 
 
 # ------------------------------- entry_points ---------------------------
-@session
+@session(read_only=True)
 async def material_list(update: Update, context: CustomContext, session: Session):
     """
     Runs on callback_data
@@ -184,7 +184,7 @@ async def material_list(update: Update, context: CustomContext, session: Session
 # -------------------------- states callbacks ---------------------------
 
 
-@session
+@session(read_only=True)
 async def material(
     update: Update,
     context: CustomContext,
@@ -501,7 +501,7 @@ def conversation(url_prefix: str):
             }
         )
 
-    return ConversationHandler(
+    return PersistentConversationHandler(
         entry_points=entry_points,
         states=states,
         fallbacks=[],
@@ -1,4 +1,3 @@
-import contextlib
 import re
 
 from sqlalchemy import and_, select
@@ -9,9 +8,11 @@ from telegram.error import Forbidden
 
 from src import constants, jobs, messages, queries
 from src.buttons import ar_buttons, en_buttons
+from src.config import Config
 from src.customcontext import CustomContext
 from src.database import Session as DBSession
 from src.models import (
+    Assignment,
     Course,
     Enrollment,
     Material,
@@ -23,7 +24,8 @@ from src.models import (
     SingleFile,
     User,
 )
-from src.utils import get_setting_value, session, user_locale
+from src.request import Lane, lane
+from src.utils import mark_unreachable, session, user_locale, users_setting_value
 
 
 @session
@@ -58,7 +60,7 @@ async def handler(update: Update, context: CustomContext, session: Session, back
         await query.answer(_("Already published").format(material_title))
         return constants.ONE
     if url.startswith(constants.CONETENT_MANAGEMENT_):
-        material.published = True
+        publish(context, material)
         await query.answer(_("Success! {} published").format(material_title))
         return await back.__wrapped__(update, context, session)
 
@@ -66,7 +68,7 @@ async def handler(update: Update, context: CustomContext, session: Session, back
     # for now we allow it but without sending notifications.
     most_recent_year = queries.academic_year(session, most_recent=True)
     if enrollment.academic_year != most_recent_year:
-        material.published = True
+        publish(context, material)
         await query.answer(_("Success! {} published").format(material_title))
         return await back.__wrapped__(update, context, session)
 
@@ -102,13 +104,13 @@ async def handler(update: Update, context: CustomContext, session: Session, back
             message, reply_markup=reply_markup, parse_mode=ParseMode.HTML
         )
     elif notify == "0":
-        material.published = True
+        publish(context, material)
         session.flush()
         await query.answer(_("Success! {} published").format(material_title))
         return await back.__wrapped__(update, context, session)
     elif notify == "1":
         # TODO handle publishing logic
-        material.published = True
+        publish(context, material)
         session.flush()
         await query.answer(_("Success! {} published").format(material_title))
         await register_jobs.__wrapped__(update, context, session)
@@ -116,6 +118,12 @@ async def handler(update: Update, context: CustomContext, session: Session, back
     return None
 
 
+def publish(context: CustomContext, material: Material) -> None:
+    material.published = True
+    if isinstance(material, Assignment):
+        jobs.schedule_deadline_reminders(context.job_queue, material)
+
+
 @session
 async def register_jobs(update: Update, context: CustomContext, session: Session):
     material_id = context.match.group("material_id")
@@ -140,6 +148,7 @@ async def register_jobs(update: Update, context: CustomContext, session: Session
         .filter(
             Enrollment.academic_year_id == academic_year_id,
             Course.id == material.course_id,
+            User.unreachable_since.is_(None),
         )
     ).all()
 
@@ -153,14 +162,20 @@ async def register_jobs(update: Update, context: CustomContext, session: Session
             f"no notification setting key found for material of type {material.type}"
         )
 
-    for i, user in enumerate(users):
-        user_setting = get_setting_value(
-            session, user_id=user.id, setting_key=setting_key
-        )
+    user_settings = users_setting_value(
+        session, user_ids=[user.id for user in users], setting_key=setting_key
+    )
+    users = [user for user in users if bool(user_settings[user.id])]
 
-        if bool(user_setting) is False:
-            return
+    digest_settings = users_setting_value(
+        session, user_ids=[user.id for user in users], setting_key=SettingKey.DIGEST
+    )
+    for user in users:
+        if digest_settings[user.id]:
+            add_to_digest(context, user, material)
+    users = [user for user in users if not digest_settings[user.id]]
 
+    for i, user in enumerate(users):
         JOBNAME = (
             str(context.user_data["telegram_id"])
             + "_NOTIFY_"
@@ -189,6 +204,75 @@ async def register_jobs(update: Update, context: CustomContext, session: Session
         )
 
 
+def add_to_digest(context: CustomContext, user: User, material: Material) -> None:
+    """Buffer the notification of :paramref:`material` for :paramref:`user`. The
+    first buffered notification starts a window of `NOTIFICATION_DIGEST_WINDOW`
+    seconds, after which :func:`send_digest` sends them all in one message."""
+    JOBNAME = f"DIGEST_{user.telegram_id}"
+    if current_jobs := context.job_queue.get_jobs_by_name(JOBNAME):
+        current_jobs[0].data["material_ids"].append(material.id)
+        return
+    context.job_queue.run_once(
+        send_digest,
+        when=Config.NOTIFICATION_DIGEST_WINDOW,
+        name=JOBNAME,
+        data={
+            "user_id": user.id,
+            "telegram_id": user.telegram_id,
+            "chat_id": user.chat_id,
+            "language_code": user.language_code,
+            "material_ids": [material.id],
+        },
+        chat_id=user.chat_id,
+        user_id=user.telegram_id,
+    )
+
+
+@lane(Lane.NOTIFICATION)
+async def send_digest(context: CustomContext) -> None:
+    """Send the notifications buffered by :func:`add_to_digest` as one message,
+    with a button for each material."""
+    data: dict = context.job.data
+    language_code: str = data["language_code"]
+    translation = user_locale(language_code)
+    buttons = ar_buttons if language_code == constants.AR else en_buttons
+
+    with DBSession.begin() as session:
+        materials = session.scalars(
+            select(Material)
+            .where(Material.id.in_(data["material_ids"]), Material.published)
+            .order_by(Material.course_id, Material.id)
+        ).all()
+        if not materials:
+            return
+
+        lines = [
+            "• "
+            + material.course.get_name(language_code)
+            + " ─ "
+            + messages.material_title_text(
+                material=material, language_code=language_code
+            )
+            for material in materials
+        ]
+        message = (
+            "🔔 " + translation.gettext("New materials") + "\n\n" + "\n".join(lines)
+        )
+        keyboard = [
+            [buttons.material(f"{constants.NOTIFICATION_}/{material.type}", material)]
+            for material in materials
+        ]
+        try:
+            await context.bot.send_message(
+                data["chat_id"],
+                text=message,
+                reply_markup=InlineKeyboardMarkup(keyboard),
+            )
+        except Forbidden:
+            mark_unreachable(session, data["user_id"])
+
+
+@lane(Lane.NOTIFICATION)
 async def send_notification(context: CustomContext) -> None:
     """Send the notification message."""
     job = context.job
@@ -210,40 +294,42 @@ async def send_notification(context: CustomContext) -> None:
 
     with DBSession.begin() as session:
         session.add_all([material, user])
-        with contextlib.suppress(Forbidden):
-            url = f"{constants.NOTIFICATION_}/{material.type}"
-            message = (
-                translation.gettext("t-symbol")
-                + "─ 🔔 "
-                + material.course.get_name(user.language_code)
-                + "\n│ "
-                + translation.gettext("corner-symbol")
-                + "── "
-                + (
-                    messages.material_message_text(
-                        url,
-                        CustomContext(
-                            context.application,
-                            user_id=user.telegram_id,
-                            chat_id=user.chat_id,
-                        ),
-                        material,
-                    )
-                    if not isinstance(material, SingleFile)
-                    else translation.gettext(material.type)
+        url = f"{constants.NOTIFICATION_}/{material.type}"
+        message = (
+            translation.gettext("t-symbol")
+            + "─ 🔔 "
+            + material.course.get_name(user.language_code)
+            + "\n│ "
+            + translation.gettext("corner-symbol")
+            + "── "
+            + (
+                messages.material_message_text(
+                    url,
+                    CustomContext(
+                        context.application,
+                        user_id=user.telegram_id,
+                        chat_id=user.chat_id,
+                    ),
+                    material,
                 )
+                if not isinstance(material, SingleFile)
+                else translation.gettext(material.type)
             )
+        )
 
-            keyboard = [[buttons.show_more(f"{url}/{material.id}")]]
-            if isinstance(material, (Review, SingleFile)):
-                keyboard = [[buttons.material(url, material)]]
-            reply_markup = InlineKeyboardMarkup(keyboard)
+        keyboard = [[buttons.show_more(f"{url}/{material.id}")]]
+        if isinstance(material, (Review, SingleFile)):
+            keyboard = [[buttons.material(url, material)]]
+        reply_markup = InlineKeyboardMarkup(keyboard)
+        try:
             await context.bot.send_message(
                 user.chat_id,
                 text=message,
                 reply_markup=reply_markup,
                 parse_mode=ParseMode.HTML,
             )
+        except Forbidden:
+            mark_unreachable(session, user.id)
 
     if is_last:
         await context.bot.send_message(
@@ -1,16 +1,33 @@
+import contextlib
+import hashlib
+import json
+import logging
 from itertools import groupby
-from typing import Optional
+from typing import Optional, Union
 
-from sqlalchemy import select
+from sqlalchemy import delete, exc, select
 from sqlalchemy.orm import Session
 from telegram import InputMedia, Update
+from telegram.error import RetryAfter, TelegramError
 
 from src import constants, messages
+from src.config import Config
 from src.customcontext import CustomContext
-from src.models import Enrollment, File, HasNumber, RefFilesMixin, Review, SingleFile
+from src.database import Session as DBSession
+from src.models import (
+    Enrollment,
+    File,
+    HasNumber,
+    RefFilesMixin,
+    Review,
+    SentMedia,
+    SingleFile,
+)
 from src.models.material import __classes__, get_material_class
 from src.utils import build_media_group, session
 
+logger = logging.getLogger(__name__)
+
 TYPES = "|".join(
     [
         cls.__mapper_args__.get("polymorphic_identity")
@@ -20,7 +37,7 @@ TYPES = "|".join(
 )
 
 
-@session
+@session(read_only=True)
 async def send(
     update: Update,
     context: CustomContext,
@@ -72,10 +89,11 @@ async def send(
             return "document"
         return "voice"
 
+    # What gets sent, in order: a voice file id, or an album and its caption
+    parts: list[Union[str, tuple[list[InputMedia], Optional[str]]]] = []
     for group, group_files in groupby(files, key=keygetter):
         if group == "voice":
-            for file in group_files:
-                await update.effective_message.reply_voice(file.telegram_id)
+            parts.extend(file.telegram_id for file in group_files)
             continue
         albums = build_media_group(
             [InputMedia(file.type, file.telegram_id) for file in group_files]
@@ -91,7 +109,150 @@ async def send(
                     if len(albums) > 1
                     else ""
                 )
+            parts.append((album, caption))
 
-            await query.message.reply_media_group(media=album, caption=caption)
+    await send_parts(context, update.effective_chat.id, parts)
 
     return constants.ONE
+
+
+def parts_key(parts: list[Union[str, tuple[list[InputMedia], Optional[str]]]]) -> str:
+    return hashlib.sha256(
+        json.dumps(
+            [
+                (
+                    part
+                    if isinstance(part, str)
+                    else [[media.media for media in part[0]], part[1]]
+                )
+                for part in parts
+            ]
+        ).encode()
+    ).hexdigest()
+
+
+async def send_parts(
+    context: CustomContext,
+    chat_id: int,
+    parts: list[Union[str, tuple[list[InputMedia], Optional[str]]]],
+) -> None:
+    """Send :paramref:`parts` to :paramref:`chat_id`.
+
+    When `STORAGE_CHANNEL_CHAT_ID` is set, a set of parts is sent to the storage
+    channel the first time, and the resulting message ids are saved as
+    `SentMedia`. That request and later ones copy those messages in bulk. Without
+    a storage channel the parts are sent directly every time.
+    """
+    if not parts:
+        return
+    storage_chat_id = Config.STORAGE_CHANNEL_CHAT_ID
+    if storage_chat_id is None:
+        await send_messages(context, chat_id, parts)
+        return
+
+    # Messages each part is sent as, one per file
+    sizes = [1 if isinstance(part, str) else len(part[0]) for part in parts]
+    key = parts_key(parts)
+    with DBSession(info={"read_only": True}) as session:
+        sent = session.scalar(select(SentMedia).where(SentMedia.key == key))
+        sent = (sent.chat_id, sent.message_ids) if sent else None
+    copied, message_ids = 0, []
+    if sent is not None:
+        if sent[0] == storage_chat_id and len(sent[1]) == sum(sizes):
+            copied = await copy_messages(
+                context, chat_id, storage_chat_id, sent[1], sizes
+            )
+            if copied == len(parts):
+                return
+            # The messages of the parts that were copied are still there
+            message_ids = sent[1][: sum(sizes[:copied])]
+        # Some of the messages were deleted, or were sent to another channel:
+        # send the parts that weren't copied, after those that were
+        with DBSession.begin() as session:
+            session.execute(delete(SentMedia).where(SentMedia.key == key))
+
+    rest, rest_sizes = parts[copied:], sizes[copied:]
+    rest_ids = await send_messages(context, storage_chat_id, rest)
+    copied = await copy_messages(
+        context, chat_id, storage_chat_id, rest_ids, rest_sizes
+    )
+    if copied != len(rest):
+        await send_messages(context, chat_id, rest[copied:])
+        return
+
+    # Another request for the same files may have saved them first
+    with contextlib.suppress(exc.IntegrityError), DBSession.begin() as session:
+        session.add(
+            SentMedia(
+                key=key, chat_id=storage_chat_id, message_ids=message_ids + rest_ids
+            )
+        )
+
+
+async def send_messages(
+    context: CustomContext,
+    chat_id: int,
+    parts: list[Union[str, tuple[list[InputMedia], Optional[str]]]],
+) -> list[int]:
+    """Send :paramref:`parts` to :paramref:`chat_id` one by one.
+
+    Returns:
+        list[:obj:`int`]: The ids of the messages sent, in order.
+    """
+    message_ids = []
+    for part in parts:
+        if isinstance(part, str):
+            message = await context.bot.send_voice(chat_id, part)
+            message_ids.append(message.message_id)
+            continue
+        album, caption = part
+        messages_ = await context.bot.send_media_group(chat_id, album, caption=caption)
+        message_ids.extend(message.message_id for message in messages_)
+    return message_ids
+
+
+async def copy_messages(
+    context: CustomContext,
+    chat_id: int,
+    from_chat_id: int,
+    message_ids: list[int],
+    sizes: list[int],
+) -> int:
+    """Copy :paramref:`message_ids`, sent as parts of :paramref:`sizes` messages
+    each, in chunks of whole parts of up to 100 messages, the most `copyMessages`
+    takes. Albums are kept together.
+
+    Copying stops at the first chunk that isn't copied whole, because some of its
+    messages were deleted or :paramref:`from_chat_id` can't be read. What was
+    copied of that chunk is deleted again, so the chat only gets whole parts, in
+    order.
+
+    Returns:
+        :obj:`int`: The number of parts copied.
+    """
+    copied = start = 0
+    while copied < len(sizes):
+        end, count = copied + 1, sizes[copied]
+        while end < len(sizes) and count + sizes[end] <= 100:
+            count += sizes[end]
+            end += 1
+        chunk = message_ids[start : start + count]
+        try:
+            copies = await context.bot.copy_messages(chat_id, from_chat_id, chunk)
+        except RetryAfter:
+            # Sending the files instead would hit the same flood control
+            raise
+        except TelegramError as error:
+            # e.g. the storage channel is gone, or the bot was removed from it
+            logger.info("Copying sent media from %s failed: %s", from_chat_id, error)
+            return copied
+        if len(copies) != len(chunk):
+            logger.info("%s sent media messages were deleted", len(chunk) - len(copies))
+            with contextlib.suppress(TelegramError):
+                if copies:
+                    await context.bot.delete_messages(
+                        chat_id, [copy.message_id for copy in copies]
+                    )
+            return copied
+        copied, start = end, start + count
+    return copied
@@ -4,12 +4,13 @@ from sqlalchemy import select
 from sqlalchemy.orm import Session
 from telegram import InlineKeyboardMarkup, Update
 from telegram.constants import ParseMode
-from telegram.ext import CallbackQueryHandler, ConversationHandler
+from telegram.ext import CallbackQueryHandler
 
 from src import constants, messages
 from src.conversations.material import files, sendall
 from src.customcontext import CustomContext
 from src.models import File, Material, MaterialType, RefFilesMixin, Review, SingleFile
+from src.persistence import PersistentConversationHandler
 from src.utils import build_menu, session
 
 # ------------------------- Callbacks -----------------------------
@@ -132,7 +133,7 @@ COLLAPSABLES = "|".join(
     ]
 )
 
-notifications_ = ConversationHandler(
+notifications_ = PersistentConversationHandler(
     entry_points=[
         CallbackQueryHandler(
             material,
@@ -3,18 +3,19 @@
 from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
 
-from babel.dates import format_timedelta
 from sqlalchemy import select
 from sqlalchemy.orm import Session
 from telegram import InlineKeyboardMarkup, Update
 from telegram.constants import ParseMode
-from telegram.ext import CallbackQueryHandler, ConversationHandler
+from telegram.ext import CallbackQueryHandler
 
 from src import constants, messages
 from src.conversations.material import files, sendall
 from src.customcontext import CustomContext
+from src.formatting import format_timedelta
 from src.models import File, MaterialType
 from src.models.material import Assignment
+from src.persistence import PersistentConversationHandler
 from src.utils import build_menu, session
 
 # ------------------------- Callbacks -----------------------------
@@ -159,7 +160,7 @@ async def collapse_material(
 
 TYPES = MaterialType.ASSIGNMENT
 
-reminder_ = ConversationHandler(
+reminder_ = PersistentConversationHandler(
     entry_points=[
         CallbackQueryHandler(
             assignment,
@@ -1,12 +1,13 @@
 from sqlalchemy.orm import Session
 from telegram import InlineKeyboardMarkup, LinkPreviewOptions, Update
 from telegram.constants import ParseMode
-from telegram.ext import CallbackQueryHandler, ConversationHandler
+from telegram.ext import CallbackQueryHandler
 
-from src import commands, constants, messages, queries
+from src import cache, commands, constants, jobs, messages, queries
 from src.customcontext import CustomContext
 from src.models import RoleName, Status
-from src.utils import session, set_my_commands, user_locale
+from src.persistence import PersistentConversationHandler
+from src.utils import session, user_locale
 
 URLPREFIX = constants.REQUEST_MANAGEMENT_
 """Used as a prefix for all `callback data` in this conversation"""
@@ -45,6 +46,7 @@ async def request_action(update: Update, context: CustomContext, session: Sessio
             if e.access_request and e.access_request.status == Status.GRANTED
         ]
         request.status = Status.GRANTED
+        cache.invalidate_editors(session, request.enrollment.academic_year_id)
         await context.bot.send_message(
             user.chat_id,
             gettext("Congratulations! New access"),
@@ -61,7 +63,7 @@ async def request_action(update: Update, context: CustomContext, session: Sessio
         )
         if len(granted_accessess) == 0:
             user.roles.append(queries.role(session, RoleName.EDITOR))
-            await set_my_commands(context.bot, user)
+            jobs.queue_commands(context.job_queue, user)
             help_message = messages.help(
                 user_roles={role.name for role in user.roles},
                 language_code=user.language_code,
@@ -77,6 +79,7 @@ async def request_action(update: Update, context: CustomContext, session: Sessio
     if action == Status.REJECTED:
         session.delete(request)
         request.status = Status(action)
+        cache.invalidate_editors(session, request.enrollment.academic_year_id)
     chat = await context.bot.get_chat(request.enrollment.user.chat_id)
     message = messages.successfull_request_action(request, chat, context=context)
     keyboard = [
@@ -174,7 +177,7 @@ states = {
     ]
 }
 
-requestmanagement_ = ConversationHandler(
+requestmanagement_ = PersistentConversationHandler(
     entry_points=entry_points,
     states=states,
     fallbacks=[],
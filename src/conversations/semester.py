@@ -9,7 +9,6 @@ from telegram.constants import ParseMode
 from telegram.ext import (
     CallbackQueryHandler,
     CommandHandler,
-    ConversationHandler,
     MessageHandler,
     filters,
 )
@@ -19,6 +18,7 @@ from src.constants import ADD, COMMANDS, DELETE, EDIT, NUMBER, ONE, SEMESTER_, S
 from src.customcontext import CustomContext
 from src.messages import bold
 from src.models import RoleName, Semester
+from src.persistence import PersistentConversationHandler
 from src.utils import build_menu, roles, session
 
 URLPREFIX = SEMESTER_
@@ -242,7 +242,7 @@ states.update(
     }
 )
 
-semester_ = ConversationHandler(
+semester_ = PersistentConversationHandler(
     entry_points=entry_points,
     states=states,
     fallbacks=[],
@@ -5,18 +5,19 @@ import re
 from sqlalchemy.orm import Session
 from telegram import InlineKeyboardMarkup, Update
 from telegram.constants import ParseMode
-from telegram.ext import CallbackQueryHandler, ConversationHandler
+from telegram.ext import CallbackQueryHandler
 
 from src import commands, constants, queries
 from src.customcontext import CustomContext
 from src.messages import bold
 from src.models import SettingKey
+from src.persistence import PersistentConversationHandler
 from src.utils import (
     build_menu,
-    get_setting_value,
+    get_setting_values,
     session,
     set_my_commands,
-    set_setting_value,
+    set_setting_values,
 )
 
 # ------------------------- Callbacks -----------------------------
@@ -105,10 +106,14 @@ async def notifications(
     url = re.search(rf".*/{constants.NOTIFICATIONS}", context.match.group()).group()
 
     menu: list = []
-    for notification_setting in SettingKey.get_notification_keys():
-        value = get_setting_value(
-            session, context.user_data["id"], notification_setting
-        )
+    values = get_setting_values(
+        session,
+        context.user_data["id"],
+        [*SettingKey.get_notification_keys(), SettingKey.DIGEST],
+        use_cache=True,
+    )
+    digest = values.pop(SettingKey.DIGEST)
+    for notification_setting, value in values.items():
         menu.append(
             context.buttons.notification_setting_item(
                 notification_setting,
@@ -119,7 +124,13 @@ async def notifications(
     keyboard = build_menu(
         menu,
         3,
-        header_buttons=context.buttons.disable_all(f"{url}/{constants.EDIT}?all=0"),
+        header_buttons=[
+            context.buttons.disable_all(f"{url}/{constants.EDIT}?all=0"),
+            context.buttons.digest(
+                f"{url}/{constants.EDIT}?{SettingKey.DIGEST.name}={int(not digest)}",
+                selected=bool(digest),
+            ),
+        ],
         footer_buttons=context.buttons.back(url, f"/{constants.NOTIFICATIONS}"),
     )
     reply_markup = InlineKeyboardMarkup(keyboard)
@@ -151,14 +162,21 @@ async def edit_notification(
     name = context.match.group("name")
     _ = context.gettext
 
+    values = get_setting_values(
+        session,
+        context.user_data["id"],
+        [*SettingKey.get_notification_keys(), SettingKey.DIGEST],
+        use_cache=True,
+    )
+
     if name == "all":
-        updated = False
-        for setting in SettingKey.get_notification_keys():
-            value = get_setting_value(session, context.user_data["id"], setting)
-            if value:
-                set_setting_value(session, context.user_data["id"], setting, False)
-                updated = True
-        if not updated:
+        enabled = {
+            setting: False
+            for setting, value in values.items()
+            if value and setting is not SettingKey.DIGEST
+        }
+        set_setting_values(session, context.user_data["id"], enabled)
+        if not enabled:
             await query.answer(_("Success! All notifications are Off"))
             return constants.ONE
         await query.answer(_("Success! All notifications are Off"))
@@ -166,20 +184,18 @@ async def edit_notification(
 
     new_value = bool(int(context.match.group("value")))
     setting_member = SettingKey[name]
-    old_value = get_setting_value(session, context.user_data["id"], setting_member)
+    old_value = values[setting_member]
     if new_value == old_value:
         await query.answer(_("Success!"))
         return await notifications.__wrapped__(update, context, session)
-    setting = set_setting_value(
-        session, context.user_data["id"], setting_member, new_value
-    )
+    set_setting_values(session, context.user_data["id"], {setting_member: new_value})
     await query.answer(_("Success!"))
     return await notifications.__wrapped__(update, context, session)
 
 
 # ------------------------- ConversationHander -----------------------------
 
-settings_ = ConversationHandler(
+settings_ = PersistentConversationHandler(
     entry_points=[
         CallbackQueryHandler(
             language,
@@ -5,13 +5,14 @@ import re
 from sqlalchemy.orm import Session
 from telegram import CallbackQuery, InlineKeyboardMarkup, Update
 from telegram.constants import ParseMode
-from telegram.ext import CallbackQueryHandler, CommandHandler, ConversationHandler
+from telegram.ext import CallbackQueryHandler, CommandHandler
 
 from src import constants, messages, queries
 from src.conversations.material import material
 from src.customcontext import CustomContext
 from src.messages import underline
 from src.models import Course, MaterialType, RoleName, UserOptionalCourse
+from src.persistence import PersistentConversationHandler
 from src.utils import build_menu, roles, session
 
 URLPREFIX = constants.UPDATE_MATERIALS_
@@ -240,7 +241,7 @@ states = {
     ]
 }
 
-updatematerials_ = ConversationHandler(
+updatematerials_ = PersistentConversationHandler(
     entry_points=entry_points,
     states=states,
     fallbacks=[],
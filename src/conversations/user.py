@@ -19,12 +19,11 @@ from telegram.error import Forbidden
 from telegram.ext import (
     CallbackQueryHandler,
     CommandHandler,
-    ConversationHandler,
     MessageHandler,
     filters,
 )
 
-from src import constants, messages, queries
+from src import cache, constants, jobs, messages, queries
 from src.constants import COMMANDS
 from src.conversations.material import files
 from src.customcontext import CustomContext
@@ -33,6 +32,7 @@ from src.models.access_request import AccessRequest, Status
 from src.models.enrollment import Enrollment
 from src.models.file import File
 from src.models.user import User
+from src.persistence import PersistentConversationHandler
 from src.utils import Pager, build_menu, roles, session, set_my_commands
 
 URLPREFIX = constants.USER_
@@ -58,7 +58,7 @@ def user_header_info(user: User, gettext) -> str:
 
 # ------------------------------- entry_points ---------------------------
 @roles(RoleName.ROOT)
-@session
+@session(read_only=True)
 async def user_list(
     update: Update,
     context: CustomContext,
@@ -425,6 +425,7 @@ async def revoke_access(update: Update, context: CustomContext, session: Session
     elif has_confirmed == "1":
         del enrollment.access_request
         session.flush()
+        cache.invalidate_editors(session, enrollment.academic_year_id)
         user = enrollment.user
         has_granted_accessess = len(
             [
@@ -436,7 +437,7 @@ async def revoke_access(update: Update, context: CustomContext, session: Session
         )
         if not has_granted_accessess:
             user.roles.remove(queries.role(session, role_name=RoleName.EDITOR))
-            await set_my_commands(context.bot, user)
+            jobs.queue_commands(context.job_queue, user)
         menu_buttons = [
             context.buttons.back(
                 url, text=_("Enrollments"), pattern=rf"/{constants.REVOKE}.*"
@@ -526,6 +527,7 @@ async def grant_no_id(update: Update, context: CustomContext, session: Session)
 
     session.add(request)
     session.flush()
+    cache.invalidate_editors(session, request.enrollment.academic_year_id)
 
     user_context = CustomContext(context.application, user.chat_id, user.telegram_id)
     user_gettext = user_context.gettext
@@ -546,7 +548,7 @@ async def grant_no_id(update: Update, context: CustomContext, session: Session)
     )
     if queries.role(session, RoleName.EDITOR) not in user.roles:
         user.roles.append(queries.role(session, RoleName.EDITOR))
-        await set_my_commands(context.bot, user)
+        jobs.queue_commands(context.job_queue, user)
         help_message = messages.help(
             user_roles={role.name for role in user.roles},
             language_code=user.language_code,
@@ -624,6 +626,7 @@ async def receive_id_file(update: Update, context: CustomContext, session: Sessi
     )
     session.add(request)
     session.flush()
+    cache.invalidate_editors(session, request.enrollment.academic_year_id)
 
     user_context = CustomContext(context.application, user.chat_id, user.telegram_id)
     user_gettext = user_context.gettext
@@ -644,7 +647,7 @@ async def receive_id_file(update: Update, context: CustomContext, session: Sessi
     )
     if queries.role(session, RoleName.EDITOR) not in user.roles:
         user.roles.append(queries.role(session, RoleName.EDITOR))
-        await set_my_commands(context.bot, user)
+        jobs.queue_commands(context.job_queue, user)
         help_message = messages.help(
             user_roles={role.name for role in user.roles},
             language_code=user.language_code,
@@ -699,6 +702,7 @@ async def enrollment_delete(update: Update, context: CustomContext, session: Ses
     elif has_confirmed == "1":
         user = enrollment.user
         session.delete(enrollment)
+        cache.invalidate_editors(session, enrollment.academic_year_id)
         granted_accessess = [
             e
             for e in user.enrollments
@@ -708,10 +712,10 @@ async def enrollment_delete(update: Update, context: CustomContext, session: Ses
             r.name for r in user.roles
         ]:
             user.roles.remove(queries.role(session, RoleName.EDITOR))
-            await set_my_commands(context.bot, user)
+            jobs.queue_commands(context.job_queue, user)
         if len(user.enrollments) == 0:
             user.roles.remove(queries.role(session, RoleName.STUDENT))
-            await set_my_commands(context.bot, user)
+            jobs.queue_commands(context.job_queue, user)
         menu_buttons = [
             context.buttons.back(
                 url, text=_("Enrollments"), pattern=rf"/\d+/{constants.DELETE}.*"
@@ -835,7 +839,7 @@ async def enrollments_add(
         )
         if is_only_enrollment:
             user.roles.append(queries.role(session, RoleName.STUDENT))
-            await set_my_commands(context.bot, user)
+            jobs.queue_commands(context.job_queue, user)
             help_message = messages.help(
                 user_roles={role.name for role in user.roles},
                 language_code=user_context.language_code,
@@ -960,7 +964,7 @@ states.update(
     }
 )
 
-user_ = ConversationHandler(
+user_ = PersistentConversationHandler(
     entry_points=entry_points,
     states=states,
     fallbacks=[],
@@ -1,9 +1,10 @@
 from typing import Optional
 
-from telegram.ext import Application, CallbackContext, ExtBot
+from telegram.ext import Application, CallbackContext, ExtBot, Job
 
 from src import constants
 from src.buttons import Buttons, ar_buttons, en_buttons
+from src.request import Lane, current_lane
 
 
 class CustomContext(CallbackContext[ExtBot, dict, dict, dict]):
@@ -18,6 +19,13 @@ class CustomContext(CallbackContext[ExtBot, dict, dict, dict]):
         super().__init__(application=application, chat_id=chat_id, user_id=user_id)
         self._message_id: Optional[int] = None
 
+    @classmethod
+    def from_job(cls, job: Job, application: Application) -> "CustomContext":
+        """Jobs are fan-outs or maintenance work, so their requests default to the
+        bulk lane. See `src.request.Lane`"""
+        current_lane.set(Lane.BULK)
+        return super().from_job(job, application)
+
     @property
     def buttons(self) -> Buttons:
         """Custom shortcut to access a value stored in the bot_data dict"""
@@ -1,11 +1,133 @@
-from sqlalchemy import create_engine
+import time
+from dataclasses import dataclass
+
+from sqlalchemy import Delete, Insert, Update, create_engine, exc, make_url
+from sqlalchemy.orm import Session as SessionType
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
 
 from src.config import Config
 from src.models import Base
 
-engine = create_engine(Config.DATABASE_URL, connect_args={"options": "-c timezone=utc"})
-Session = sessionmaker(engine)
+
+@dataclass
+class PoolMetrics:
+    """Counters collected by :class:`InstrumentedQueuePool` while handing out
+    connections."""
+
+    checkouts: int = 0
+    timeouts: int = 0
+    wait_seconds_total: float = 0.0
+    wait_seconds_max: float = 0.0
+
+    def observe_wait(self, seconds: float) -> None:
+        self.checkouts += 1
+        self.wait_seconds_total += seconds
+        self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+
+
+class InstrumentedQueuePool(QueuePool):
+    """A :class:`QueuePool` that records how long callers wait for a connection
+    and how often they time out waiting."""
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            self.metrics.timeouts += 1
+            raise
+        finally:
+            self.metrics.observe_wait(time.perf_counter() - start)
+
+
+def create_engine_from_url(url: str):
+    """Create an engine with the pool settings from :class:`Config`."""
+    connect_args = {}
+    if make_url(url).get_backend_name() == "postgresql":
+        options = "-c timezone=utc"
+        if Config.DB_STATEMENT_TIMEOUT is not None:
+            options += f" -c statement_timeout={Config.DB_STATEMENT_TIMEOUT}"
+        connect_args = {
+            "options": options,
+            "application_name": Config.DB_APPLICATION_NAME,
+        }
+    return create_engine(
+        url,
+        connect_args=connect_args,
+        poolclass=InstrumentedQueuePool,
+        pool_size=Config.DB_POOL_SIZE,
+        max_overflow=Config.DB_MAX_OVERFLOW,
+        pool_timeout=Config.DB_POOL_TIMEOUT,
+        pool_recycle=Config.DB_POOL_RECYCLE,
+        pool_pre_ping=Config.DB_POOL_PRE_PING,
+    )
+
+
+def pool_status(engine_=None) -> dict:
+    """Return a snapshot of the saturation gauges of an engine's pool.
+
+    Args:
+        engine_ (:obj:`Engine`, optional): Defaults to :data:`engine`.
+    """
+    pool: InstrumentedQueuePool = (engine_ or engine).pool
+    metrics = pool.metrics
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        "max_overflow": Config.DB_MAX_OVERFLOW,
+        "checkouts": metrics.checkouts,
+        "timeouts": metrics.timeouts,
+        "wait_avg_ms": (
+            metrics.wait_seconds_total / metrics.checkouts * 1000
+            if metrics.checkouts
+            else 0.0
+        ),
+        "wait_max_ms": metrics.wait_seconds_max * 1000,
+    }
+
+
+class RoutingSession(SessionType):
+    """A session that sends read-only transactions to the replica engine.
+
+    A session is read-only when created with ``info={"read_only": True}``, see
+    :func:`src.utils.session`. Flushes and DML statements always go to the
+    primary engine, so an accidental write in a read-only session still lands
+    on the primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if (
+            self.info.get("read_only")
+            and not self._flushing
+            and not isinstance(clause, (Insert, Update, Delete))
+        ):
+            return replica_engine
+        return engine
+
+
+engine = create_engine_from_url(Config.DATABASE_URL)
+"""The primary engine, all writes go through it"""
+
+replica_engine = (
+    create_engine_from_url(Config.DATABASE_REPLICA_URL)
+    if Config.DATABASE_REPLICA_URL
+    else engine
+)
+"""Engine for read-only transactions. Same as :data:`engine` when no replica
+is configured"""
+
+Session = sessionmaker(class_=RoutingSession)
 
 
-Base.metadata.create_all(engine)
+def create_tables() -> None:
+    """Create the tables missing from the database, one catalog query per table.
+    Meant for local databases, deployments run ``alembic upgrade head`` instead,
+    see `DB_CREATE_ALL`."""
+    Base.metadata.create_all(engine)
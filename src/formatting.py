@@ -0,0 +1,62 @@
+"""Contains memoized drop-in replacements of the Babel date formatting functions
+used on hot paths, like a reminder formatted for every one of its recipients.
+
+Babel parses the locale on every call, and applies the pattern to the value even
+when it formatted the same value before. Here the bot's locales are parsed once,
+and results are memoized in `cache.formatted`. Babel already caches the parsed
+patterns themselves.
+"""
+
+from collections.abc import Callable
+from datetime import date, datetime, timedelta
+from typing import Any, Union
+
+from babel import Locale, dates
+
+from src import cache, constants
+
+LOCALES = {code: Locale.parse(code) for code in (constants.EN, constants.AR)}
+
+
+def get_locale(language_code: str) -> Locale:
+    return LOCALES.get(language_code) or Locale.parse(language_code)
+
+
+def _memoize(function: Callable[..., str], value: Any, locale: str, **kwargs) -> str:
+    # Equal aware datetimes in different time zones are formatted differently
+    key = (function.__name__, value, getattr(value, "tzinfo", None), locale)
+    key += tuple(kwargs.items())
+    text = cache.formatted.get(key)
+    if text is None:
+        text = function(value, locale=get_locale(locale), **kwargs)
+        cache.formatted.set(key, text)
+    return text
+
+
+def format_datetime(value: datetime, format: str, locale: str) -> str:
+    """See `babel.dates.format_datetime`."""
+    return _memoize(dates.format_datetime, value, locale, format=format)
+
+
+def format_date(value: Union[date, datetime], format: str, locale: str) -> str:
+    """See `babel.dates.format_date`."""
+    return _memoize(dates.format_date, value, locale, format=format)
+
+
+def format_timedelta(
+    delta: timedelta,
+    granularity: str = "second",
+    threshold: float = 0.85,
+    format: str = "long",
+    locale: str = constants.EN,
+) -> str:
+    """See `babel.dates.format_timedelta`. Values are memoized by whole seconds,
+    the precision Babel formats them with."""
+    return _memoize(
+        dates.format_timedelta,
+        timedelta(days=delta.days, seconds=delta.seconds),
+        locale,
+        granularity=granularity,
+        threshold=threshold,
+        format=format,
+    )
@@ -0,0 +1,379 @@
+"""Contains the queue updates are put on when they're received and the processor
+that takes them off it.
+
+The webhook answers Telegram as soon as an update is on the
+:class:`DurableUpdateQueue`, which can be bounded so a burst applies back pressure
+instead of piling up in memory, and can store every update until it's processed
+so none are lost to a crash or a restart. Updates Telegram delivers again are
+dropped by :class:`UpdateWindow` before they're queued.
+:class:`KeyedUpdateProcessor` then
+processes updates concurrently, but those of the same user one at a time and in
+the order they were received, skipping repeated taps on a button with
+:class:`CallbackDebouncer`.
+"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+from collections.abc import Collection
+from datetime import UTC, datetime, timedelta
+from typing import Any, Optional
+
+from sqlalchemy import delete, exc, select, update
+from telegram import Bot, Update
+from telegram.error import TelegramError
+from telegram.ext import BaseUpdateProcessor
+
+from src.database import Session
+from src.models import QueuedUpdate, UpdateCheckpoint
+
+logger = logging.getLogger(__name__)
+
+
+class UpdateWindow:
+    """Remembers the ids of the last :paramref:`size` updates received, and the
+    highest one, which is saved to the `update_checkpoint` table by :meth:`save`.
+
+    Args:
+        size (:obj:`int`): Number of recent update ids remembered.
+        floor (:obj:`int`, optional): Updates with an id up to this one were
+            received before the last start, see :meth:`load`.
+    """
+
+    def __init__(self, size: int, floor: int = 0) -> None:
+        self.floor = floor
+        self.mark = floor
+        self._saved = floor
+        self._ids: deque[int] = deque(maxlen=size)
+        self._seen: set[int] = set()
+
+    @classmethod
+    def load(cls, size: int) -> "UpdateWindow":
+        with Session(info={"read_only": True}) as session:
+            checkpoint = session.get(UpdateCheckpoint, 1)
+        return cls(size, floor=checkpoint.update_id if checkpoint else 0)
+
+    def seen(self, update_id: int) -> bool:
+        """Whether :paramref:`update_id` was received before."""
+        # Telegram picks the next id at random after a week without updates, so
+        # only ids just below the floor are taken for ones received before
+        return (
+            self.floor - self._ids.maxlen < update_id <= self.floor
+            or update_id in self._seen
+        )
+
+    def add(self, update_id: int) -> None:
+        """Record :paramref:`update_id` as received. Must only be called once the
+        update is queued, so a delivery that failed isn't dropped when Telegram
+        retries it."""
+        if len(self._ids) == self._ids.maxlen:
+            self._seen.discard(self._ids[0])
+        self._ids.append(update_id)
+        self._seen.add(update_id)
+        self.mark = max(self.mark, update_id)
+
+    def save(self) -> None:
+        """Save :attr:`mark` if it moved since the last save. The saved mark
+        never decreases, replicas can share it."""
+        mark = self.mark
+        if mark == self._saved:
+            return
+        with Session.begin() as session:
+            checkpoint = session.get(UpdateCheckpoint, 1, with_for_update=True)
+            if checkpoint is None:
+                session.add(UpdateCheckpoint(update_id=mark))
+            elif checkpoint.update_id < mark:
+                checkpoint.update_id = mark
+        self._saved = mark
+
+
+class DurableUpdateQueue(asyncio.Queue):
+    """The `Application.update_queue`.
+
+    Args:
+        maxsize (:obj:`int`, optional): Receiving an update waits while this many
+            are queued. `0` for no bound.
+        durable (:obj:`bool`, optional): Whether updates are stored in the
+            `queued_update` table until :meth:`ack` is called with them.
+        owner (:obj:`str`, optional): Name of this replica. Stored updates are
+            restored by their owner, or by another replica once the owner stopped,
+            see :meth:`restore`.
+        window (:obj:`UpdateWindow`, optional): Updates it has seen are dropped.
+        max_age (:obj:`float`, optional): Seconds after which a stored update is
+            dropped instead of restored. Kept until processed by default.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 0,
+        durable: bool = False,
+        owner: str = "default",
+        window: Optional[UpdateWindow] = None,
+        max_age: Optional[float] = None,
+    ) -> None:
+        super().__init__(maxsize)
+        self.durable = durable
+        self.owner = owner
+        self.window = window
+        self.max_age = max_age
+        self._stored: set[int] = set()
+        self._restoring = False
+
+    def full(self) -> bool:
+        return not self._restoring and super().full()
+
+    def put_nowait(self, item: Any) -> None:
+        if self.full():
+            raise asyncio.QueueFull
+        if (
+            self.window is not None
+            and isinstance(item, Update)
+            and not self._restoring
+            and self.window.seen(item.update_id)
+        ):
+            logger.debug("Dropped update %s delivered again", item.update_id)
+            return
+        if (
+            self.durable
+            and isinstance(item, Update)
+            and not self._restoring
+            and (item.update_id in self._stored or not self._store(item))
+        ):
+            # Telegram delivered it again, the first copy is already queued
+            logger.debug("Update %s is already queued", item.update_id)
+            return
+        super().put_nowait(item)
+        if self.window is not None and isinstance(item, Update) and not self._restoring:
+            self.window.add(item.update_id)
+
+    def _store(self, update: Update) -> bool:
+        try:
+            with Session.begin() as session:
+                session.add(
+                    QueuedUpdate(
+                        update_id=update.update_id,
+                        owner=self.owner,
+                        data=update.to_dict(),
+                    )
+                )
+        except exc.IntegrityError:
+            return False
+        self._stored.add(update.update_id)
+        return True
+
+    def ack(self, update: object) -> None:
+        """Forget a stored update once it's processed."""
+        if not (isinstance(update, Update) and update.update_id in self._stored):
+            return
+        with Session.begin() as session:
+            session.execute(
+                delete(QueuedUpdate).where(QueuedUpdate.update_id == update.update_id)
+            )
+        self._stored.discard(update.update_id)
+
+    def restore(self, bot: Bot, live_owners: Collection[str] = ()) -> None:
+        """Queue the stored updates no running replica is going to process, oldest
+        first: those of :attr:`owner` that weren't processed before the last
+        shutdown, and those of replicas that stopped, which are claimed first.
+        Updates older than :attr:`max_age` are dropped instead.
+
+        Restored updates are queued even if that exceeds `maxsize`.
+
+        Args:
+            bot (:obj:`telegram.Bot`): The bot the updates are for.
+            live_owners (Collection[:obj:`str`], optional): Names of the running
+                replicas, whose updates are left to them.
+        """
+        if not self.durable:
+            return
+        others = set(live_owners) - {self.owner}
+        with Session.begin() as session:
+            if self.max_age is not None:
+                expired = session.execute(
+                    delete(QueuedUpdate).where(
+                        QueuedUpdate.received_at
+                        < datetime.now(UTC) - timedelta(seconds=self.max_age)
+                    )
+                ).rowcount
+                if expired:
+                    logger.warning("Dropped %s expired stored updates", expired)
+            session.execute(
+                update(QueuedUpdate)
+                .where(
+                    QueuedUpdate.owner != self.owner,
+                    QueuedUpdate.owner.not_in(others),
+                )
+                .values(owner=self.owner)
+            )
+            rows = [
+                (update_id, data)
+                for update_id, data in session.execute(
+                    select(QueuedUpdate.update_id, QueuedUpdate.data)
+                    .where(QueuedUpdate.owner == self.owner)
+                    .order_by(QueuedUpdate.id)
+                )
+                if update_id not in self._stored
+            ]
+        if rows:
+            logger.info("Restoring %s unprocessed updates", len(rows))
+        self._restoring = True
+        try:
+            for update_id, data in rows:
+                self._stored.add(update_id)
+                self.put_nowait(Update.de_json(data, bot))
+        finally:
+            self._restoring = False
+
+
+class CallbackDebouncer:
+    """Tells whether a callback query repeats one of its user with the same data
+    that is still processed, or that finished processing less than
+    :paramref:`window` seconds ago.
+
+    Args:
+        window (:obj:`float`): Seconds.
+    """
+
+    def __init__(self, window: float) -> None:
+        self.window = window
+        self._running: set[tuple[int, str]] = set()
+        # Ordered by finish time, so expired keys are at the front
+        self._finished: OrderedDict[tuple[int, str], float] = OrderedDict()
+
+    @staticmethod
+    def key(update: object) -> Optional[tuple[int, str]]:
+        if isinstance(update, Update) and (query := update.callback_query):
+            return (query.from_user.id, query.data or "")
+        return None
+
+    def is_repeat(self, key: tuple[int, str]) -> bool:
+        expired = time.monotonic() - self.window
+        while self._finished and next(iter(self._finished.values())) <= expired:
+            self._finished.popitem(last=False)
+        return key in self._running or key in self._finished
+
+    def start(self, key: tuple[int, str]) -> None:
+        self._running.add(key)
+
+    def finish(self, key: tuple[int, str]) -> None:
+        self._running.discard(key)
+        self._finished.pop(key, None)
+        self._finished[key] = time.monotonic()
+
+
+class KeyedUpdateProcessor(BaseUpdateProcessor):
+    """Processes up to :paramref:`max_concurrent_updates` updates at once, but the
+    updates of the same user one at a time, in the order they were received.
+    Updates without a user are only limited by the number of workers.
+
+    Args:
+        max_concurrent_updates (:obj:`int`): Number of workers.
+        queue (:obj:`DurableUpdateQueue`, optional): Updates are acknowledged to it
+            once processed.
+        debouncer (:obj:`CallbackDebouncer`, optional): Repeated callback queries
+            are answered right away instead of processed.
+    """
+
+    __slots__ = ("_locks", "_pending", "_received", "_running", "debouncer", "queue")
+
+    def __init__(
+        self,
+        max_concurrent_updates: int,
+        queue: Optional[DurableUpdateQueue] = None,
+        debouncer: Optional[CallbackDebouncer] = None,
+    ) -> None:
+        super().__init__(max_concurrent_updates)
+        self.queue = queue
+        self.debouncer = debouncer
+        self._locks: dict[int, asyncio.Lock] = {}
+        self._pending: dict[int, int] = {}
+        self._received = 0
+        """Updates taken off the queue and not processed yet"""
+        self._running = 0
+        """Updates being processed by a worker"""
+
+    def backlog(self) -> int:
+        """The number of updates waiting to be processed: those on :attr:`queue`,
+        and those taken off it that wait for a worker or for the previous updates
+        of their user. The application takes updates off the queue as soon as
+        they're received when there's more than one worker, so the queue alone
+        stays nearly empty."""
+        queued = self.queue.qsize() if self.queue is not None else 0
+        return queued + self._received - self._running
+
+    async def process_update(self, update: object, coroutine) -> None:
+        self._received += 1
+        try:
+            await self._debounce(update, coroutine)
+        finally:
+            self._received -= 1
+
+    async def _debounce(self, update: object, coroutine) -> None:
+        # Before waiting for the user's previous updates, so a repeated tap is
+        # answered right away even while the first one is still processed
+        key = CallbackDebouncer.key(update) if self.debouncer else None
+        if key is None:
+            await self._process_in_order(update, coroutine)
+            return
+        if self.debouncer.is_repeat(key):
+            coroutine.close()
+            if self.queue is not None:
+                self.queue.ack(update)
+            try:
+                await update.callback_query.answer()
+            except TelegramError as error:
+                logger.debug("Answering a repeated callback query failed: %s", error)
+            return
+        self.debouncer.start(key)
+        try:
+            await self._process_in_order(update, coroutine)
+        finally:
+            self.debouncer.finish(key)
+
+    async def _process_in_order(self, update: object, coroutine) -> None:
+        # Wait for the user's previous updates before taking a worker, so a user
+        # sending many updates at once doesn't hold up everyone else.
+        # `asyncio.Lock` wakes waiters in order, and updates are taken off the
+        # queue in order, which keeps them ordered.
+        key = (
+            update.effective_user.id
+            if isinstance(update, Update) and update.effective_user
+            else None
+        )
+        if key is None:
+            await self._process(update, coroutine)
+            return
+
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        self._pending[key] = self._pending.get(key, 0) + 1
+        try:
+            async with lock:
+                await self._process(update, coroutine)
+        finally:
+            self._pending[key] -= 1
+            if not self._pending[key]:
+                del self._pending[key]
+                del self._locks[key]
+
+    async def _process(self, update: object, coroutine) -> None:
+        try:
+            await super().process_update(update, coroutine)
+        finally:
+            if self.queue is not None:
+                self.queue.ack(update)
+
+    async def do_process_update(self, update: object, coroutine) -> None:
+        self._running += 1
+        try:
+            await coroutine
+        finally:
+            self._running -= 1
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
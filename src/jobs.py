@@ -1,17 +1,19 @@
-import contextlib
 import datetime
-from zoneinfo import ZoneInfo
+import logging
 
-from babel.dates import format_timedelta
-from sqlalchemy import and_, select
-from sqlalchemy.orm import aliased
+from sqlalchemy import and_, case, select
+from sqlalchemy.orm import aliased, joinedload
 from telegram import InlineKeyboardMarkup
-from telegram.error import Forbidden
+from telegram.error import Forbidden, TelegramError
+from telegram.ext import JobQueue
 
 from src import constants
 from src.buttons import ar_buttons, en_buttons
+from src.config import Config
 from src.customcontext import CustomContext
-from src.database import Session
+from src.database import Session, pool_status
+from src.formatting import format_timedelta
+from src.leader import election
 from src.models import Assignment
 from src.models.course import Course
 from src.models.enrollment import Enrollment
@@ -19,7 +21,10 @@ from src.models.program_semester import ProgramSemester
 from src.models.program_semester_course import ProgramSemesterCourse
 from src.models.semester import Semester
 from src.models.user import User
-from src.utils import user_locale
+from src.request import Lane, lane
+from src.utils import mark_unreachable, set_my_commands, time_remaining, user_locale
+
+logger = logging.getLogger(__name__)
 
 
 def remove_job_if_exists(name: str, context: CustomContext) -> bool:
@@ -32,170 +37,209 @@ def remove_job_if_exists(name: str, context: CustomContext) -> bool:
     return True
 
 
-async def deadline_reminder(context: CustomContext):
-    job = context.job
-    await context.bot.send_message(
-        job.chat_id,
-        text=context.gettext("Started assignment deadline reminders"),
-        disable_notification=True,
+async def log_pool_status(_: CustomContext):
+    """Log the saturation gauges of the database connection pool."""
+    logger.info(
+        "Database pool: %s",
+        " ".join(f"{key}={value:g}" for key, value in pool_status().items()),
+    )
+
+
+async def save_update_checkpoint(context: CustomContext):
+    """Save the highest update id received, see `UpdateWindow`."""
+    context.job.data.save()
+
+
+def queue_commands(job_queue: JobQueue, user: User) -> None:
+    """Push the command menu of :paramref:`user` in the background, for role
+    changes made by someone else. Users queued within `COMMANDS_PUSH_DELAY`
+    seconds are pushed in one batch by :func:`push_commands`, after the changes
+    are committed."""
+    if current_jobs := job_queue.get_jobs_by_name("PUSH_COMMANDS"):
+        current_jobs[0].data.add(user.id)
+        return
+    job_queue.run_once(
+        push_commands,
+        when=Config.COMMANDS_PUSH_DELAY,
+        name="PUSH_COMMANDS",
+        data={user.id},
     )
-    current_time = datetime.datetime.now(datetime.UTC)
-    with Session.begin() as session:
-        assignments: list[Assignment] = session.scalars(
+
+
+async def push_commands(context: CustomContext) -> None:
+    """Push the command menus queued by :func:`queue_commands`, on the rate
+    limited bulk lane. Menus that didn't change are skipped, see
+    `set_my_commands`."""
+    for user_id in sorted(context.job.data):
+        with Session.begin() as session:
+            user = session.get(User, user_id)
+            if user is None or user.unreachable_since:
+                continue
+            try:
+                await set_my_commands(context.bot, user)
+            except TelegramError as error:
+                logger.warning(
+                    "Pushing the commands of user %s failed: %s", user_id, error
+                )
+
+
+def schedule_deadline_reminders(job_queue: JobQueue, assignment: Assignment) -> None:
+    """(Re)schedule the reminders of :paramref:`assignment`, one job for each of
+    `DEADLINE_REMINDER_OFFSETS`. Must be called whenever the deadline or the
+    published state of an assignment changes.
+
+    Does nothing unless this replica is the leader, the leader picks the change up
+    with :func:`sync_deadline_reminders` instead."""
+    if not election.is_leader:
+        return
+    now = datetime.datetime.now(datetime.UTC)
+    for offset in Config.DEADLINE_REMINDER_OFFSETS:
+        JOBNAME = f"DEADLINE_REMINDER_{assignment.id}_{offset:g}"
+        for job in job_queue.get_jobs_by_name(JOBNAME):
+            job.schedule_removal()
+        if not (assignment.published and assignment.deadline):
+            continue
+        when = assignment.deadline - datetime.timedelta(hours=offset)
+        if when <= now:
+            continue
+        job_queue.run_once(
+            deadline_reminder,
+            when=when,
+            name=JOBNAME,
+            data={"assignment_id": assignment.id, "deadline": assignment.deadline},
+        )
+
+
+def schedule_all_deadline_reminders(job_queue: JobQueue) -> None:
+    """Rebuild the reminder jobs of every upcoming deadline."""
+    with Session(info={"read_only": True}) as session:
+        assignments = session.scalars(
             select(Assignment).where(
                 Assignment.published,
-                Assignment.deadline is not None,
-                Assignment.deadline > current_time,
-                and_(
-                    and_(
-                        Assignment.deadline
-                        >= current_time + datetime.timedelta(hours=36),
-                        Assignment.deadline
-                        < current_time + datetime.timedelta(hours=48),
-                    ),
-                ),
+                Assignment.deadline > datetime.datetime.now(datetime.UTC),
             )
         ).all()
-        when = 2
-        for i, assignment in enumerate(assignments):
-            sub_semester = aliased(Semester)
-            sub_program_semester = aliased(ProgramSemester)
-            academic_year_id = assignment.academic_year_id
-            users: list[User] = session.scalars(
-                select(User)
-                .select_from(Assignment)
-                .join(Course)
-                .join(ProgramSemesterCourse)
-                .join(
-                    ProgramSemester,
-                    and_(
-                        ProgramSemester.program_id == ProgramSemesterCourse.program_id,
-                        ProgramSemester.semester_id
-                        == ProgramSemesterCourse.semester_id,
-                    ),
-                )
-                .join(Semester)
-                .join(
-                    Enrollment,
-                    Enrollment.program_semester_id.in_(
-                        select(sub_program_semester.id)
-                        .join(sub_semester)
-                        .where(
-                            sub_program_semester.program_id
-                            == ProgramSemester.program_id,
-                            sub_semester.number.in_(
-                                [
-                                    Semester.number,
-                                    Semester.number
-                                    + (1 if Semester.number % 2 == 1 else -1),
-                                ]
-                            ),
-                        )
-                        .subquery()
-                    ),
-                )
-                .join(User, Enrollment.user_id == User.id)
-                .where(
-                    Assignment.id == assignment.id,
-                    Enrollment.academic_year_id == academic_year_id,
-                )
-                .group_by(User)
-            ).all()
-            zone = ZoneInfo("Africa/Khartoum")
-            delta = assignment.deadline.astimezone(zone) - datetime.datetime.now(zone)
-            session.expunge(assignment)
-            for ii, user in enumerate(users):
-                JOBNAME = f"REMIND_{user.telegram_id}_{assignment.id}"
-                session.expunge(user)
-                is_last = i == len(assignments) - 1 and ii == len(users) - 1
-                remove_job_if_exists(JOBNAME, context)
-                context.job_queue.run_once(
-                    send_reminder,
-                    when=when,
-                    name=JOBNAME,
-                    data={
-                        "user": user,
-                        "assignment": assignment,
-                        "delta": delta,
-                        "is_last": is_last,
-                    },
-                    chat_id=job.chat_id,
-                    user_id=job.user_id,
-                )
-                when += 2.5
-        if len(assignments) == 0:
-            await context.bot.send_message(
-                job.chat_id,
-                text=context.gettext("Done! No reminders to send"),
-                disable_notification=True,
-            )
+        for assignment in assignments:
+            schedule_deadline_reminders(job_queue, assignment)
+    logger.info("Scheduled reminders of %s upcoming deadlines", len(assignments))
+
 
+async def sync_deadline_reminders(context: CustomContext) -> None:
+    """Run on the leader when elected, since jobs aren't persisted, and every
+    `DEADLINE_REMINDER_SYNC_INTERVAL` to pick up deadlines set on other replicas."""
+    schedule_all_deadline_reminders(context.job_queue)
 
-async def send_reminder(context: CustomContext) -> None:
-    """Send the notification message."""
+
+@lane(Lane.NOTIFICATION)
+async def deadline_reminder(context: CustomContext) -> None:
+    """Remind the students of an assignment's course about its deadline."""
     job = context.job
+    with Session(info={"read_only": True}) as session:
+        assignment = session.get(
+            Assignment,
+            job.data["assignment_id"],
+            options=[joinedload(Assignment.course)],
+        )
+        if (
+            assignment is None
+            or not assignment.published
+            or assignment.deadline != job.data["deadline"]
+        ):
+            # Deleted, unpublished or moved since the job was scheduled
+            return
+
+        sub_semester = aliased(Semester)
+        sub_program_semester = aliased(ProgramSemester)
+        users = session.execute(
+            select(User.id, User.telegram_id, User.chat_id, User.language_code)
+            .select_from(Assignment)
+            .join(Course)
+            .join(ProgramSemesterCourse)
+            .join(
+                ProgramSemester,
+                and_(
+                    ProgramSemester.program_id == ProgramSemesterCourse.program_id,
+                    ProgramSemester.semester_id == ProgramSemesterCourse.semester_id,
+                ),
+            )
+            .join(Semester)
+            .join(
+                Enrollment,
+                Enrollment.program_semester_id.in_(
+                    select(sub_program_semester.id)
+                    .join(sub_semester)
+                    .where(
+                        sub_program_semester.program_id == ProgramSemester.program_id,
+                        sub_semester.number.in_(
+                            [
+                                Semester.number,
+                                Semester.number
+                                + case((Semester.number % 2 == 0, -1), else_=1),
+                            ]
+                        ),
+                    )
+                    .scalar_subquery()
+                ),
+            )
+            .join(User, Enrollment.user_id == User.id)
+            .where(
+                Assignment.id == assignment.id,
+                Enrollment.academic_year_id == assignment.academic_year_id,
+                User.unreachable_since.is_(None),
+            )
+            .distinct()
+        ).all()
 
-    user: User = job.data["user"]
-    assignment: Assignment = job.data["assignment"]
-    delta: datetime.timedelta = job.data["delta"]
-    is_last: bool = job.data["is_last"]
+    for user in users:
+        await send_reminder(context, assignment, user)
+    logger.info(
+        "Sent reminders of assignment %s to %s users", assignment.id, len(users)
+    )
 
+
+async def send_reminder(context: CustomContext, assignment: Assignment, user) -> None:
+    """Send the reminder message to :paramref:`user`, a row of `User.id`,
+    `User.telegram_id`, `User.chat_id` and `User.language_code`."""
     # Get language for user to be notified
     translation = user_locale(user.language_code)
     gettext = translation.gettext
 
-    seconds = delta.total_seconds()
-    days = seconds // (24 * 60 * 60)
-    hours = (seconds // (60 * 60)) % 24
-    parts = [
-        format_timedelta(
-            datetime.timedelta(days=days),
-            granularity="days",
-            format="long",
-            threshold=1,
-            locale=user.language_code,
-        ),
-        format_timedelta(
-            datetime.timedelta(hours=hours),
-            granularity="hours",
-            format="long",
-            threshold=1,
-            locale=user.language_code,
-        ),
+    delta = assignment.deadline - datetime.datetime.now(datetime.UTC)
+    parts = time_remaining(delta, user.language_code) or [
+        format_timedelta(delta, locale=user.language_code)
     ]
+    remaining = (
+        gettext("time remaining {} {}").format(*parts)
+        if len(parts) > 1
+        else gettext("time remaining {}").format(*parts)
+    )
 
     buttons = ar_buttons if user.language_code == constants.AR else en_buttons
 
-    with Session.begin() as session:
-        session.add_all([assignment, user])
-        course_name = assignment.course.get_name(user.language_code)
-        assignment_title = gettext(assignment.type) + f" {assignment.number}"
-        remaining = gettext("time remaining {} {}").format(*parts)
-
-        with contextlib.suppress(Forbidden):
-            message = (
-                "⏰ "
-                + gettext("Reminder")
-                + "\n\n"
-                + gettext("{} of {} is due in {}").format(
-                    assignment_title, course_name, remaining
-                )
-            )
+    course_name = assignment.course.get_name(user.language_code)
+    assignment_title = gettext(assignment.type) + f" {assignment.number}"
 
-            keyboard = [
-                [
-                    buttons.show_more(
-                        f"{constants.REMINDER_}/{assignment.type}/{assignment.id}",
-                    )
-                ]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            await context.bot.send_message(
-                user.chat_id, text=message, reply_markup=reply_markup
-            )
+    message = (
+        "⏰ "
+        + gettext("Reminder")
+        + "\n\n"
+        + gettext("{} of {} is due in {}").format(
+            assignment_title, course_name, remaining
+        )
+    )
 
-    _ = context.gettext
-    if is_last:
+    keyboard = [
+        [
+            buttons.show_more(
+                f"{constants.REMINDER_}/{assignment.type}/{assignment.id}",
+            )
+        ]
+    ]
+    reply_markup = InlineKeyboardMarkup(keyboard)
+    try:
         await context.bot.send_message(
-            job.chat_id, text=_("Done sending reminders"), disable_notification=True
+            user.chat_id, text=message, reply_markup=reply_markup
         )
+    except Forbidden:
+        with Session.begin() as session:
+            mark_unreachable(session, user.id)
@@ -0,0 +1,163 @@
+"""Contains the leader election used when more than one replica of the bot is
+running. Every replica serves the updates it receives, but jobs that must run
+once across all of them, like deadline reminders, only run on the leader.
+
+The leader is whoever holds the leader lease, a row of the `lease` table that
+expires unless renewed by the next round of the election. A replica that stops
+renewing it, because it crashed or lost the database, loses it once it expires,
+and another one is elected. Taking and renewing a lease are single statements in
+a short transaction, so they work behind a transaction pooler like PgBouncer and
+don't hold a connection between rounds.
+
+Every replica also holds a lease of its own, its :data:`heartbeat`, for as long
+as it's running. Work a replica started, like stored updates, is only taken over
+by another one once that lease expired, see :func:`live_replicas`. Work that a
+single replica must claim, like a broadcast, has a lease of its own, see
+:func:`lease`.
+"""
+
+import logging
+from datetime import UTC, datetime, timedelta
+
+from sqlalchemy import delete, exc, or_, select, update
+
+from src.config import Config
+from src.database import Session
+from src.models import Lease
+
+logger = logging.getLogger(__name__)
+
+BOT_ID = int(Config.BOT_TOKEN.split(":")[0])
+# Replicas of the same bot share the names, other bots on the database don't
+LEADER_LEASE = f"{BOT_ID}/leader"
+REPLICA_LEASE_PREFIX = f"{BOT_ID}/replica/"
+
+
+class LeaseLock:
+    """The lease :paramref:`name`, held by :paramref:`holder`.
+
+    Args:
+        name (:obj:`str`): The lease name, shared by all replicas.
+        holder (:obj:`str`): The name of this replica.
+        ttl (:obj:`float`): Seconds the lease lasts unless renewed.
+    """
+
+    def __init__(self, name: str, holder: str, ttl: float) -> None:
+        self.name = name
+        self.holder = holder
+        self.ttl = ttl
+
+    def acquire(self) -> bool:
+        """Take the lease if it's free or expired, or renew it. Doesn't block
+        on other replicas."""
+        now = datetime.now(UTC)
+        try:
+            with Session.begin() as session:
+                renewed = session.execute(
+                    update(Lease)
+                    .where(
+                        Lease.name == self.name,
+                        or_(Lease.holder == self.holder, Lease.expires_at < now),
+                    )
+                    .values(
+                        holder=self.holder,
+                        expires_at=now + timedelta(seconds=self.ttl),
+                    )
+                    .execution_options(synchronize_session=False)
+                ).rowcount
+                if renewed:
+                    return True
+                if session.get(Lease, self.name) is not None:
+                    # Held by another replica
+                    return False
+                session.add(
+                    Lease(
+                        name=self.name,
+                        holder=self.holder,
+                        expires_at=now + timedelta(seconds=self.ttl),
+                    )
+                )
+        except exc.IntegrityError:
+            # Another replica took it first
+            return False
+        except exc.DBAPIError as error:
+            logger.warning("Can't take the lease %s: %s", self.name, error)
+            return False
+        return True
+
+    def held(self) -> bool:
+        """Whether the lease is held, by this replica or another one, and hasn't
+        expired."""
+        with Session() as session:
+            return (
+                session.scalar(
+                    select(Lease.name).where(
+                        Lease.name == self.name, Lease.expires_at >= datetime.now(UTC)
+                    )
+                )
+                is not None
+            )
+
+    def release(self) -> None:
+        try:
+            with Session.begin() as session:
+                session.execute(
+                    delete(Lease)
+                    .where(Lease.name == self.name, Lease.holder == self.holder)
+                    .execution_options(synchronize_session=False)
+                )
+        except exc.DBAPIError as error:
+            logger.warning("Can't release the lease %s: %s", self.name, error)
+
+
+class Election:
+    """Tracks whether this replica is the leader.
+
+    Args:
+        lock (:obj:`LeaseLock`): Held for as long as this replica leads.
+    """
+
+    def __init__(self, lock: LeaseLock) -> None:
+        self.lock = lock
+        self.is_leader = False
+
+    def campaign(self) -> bool:
+        """Run one round of the election.
+
+        Returns:
+            :obj:`bool`: Whether :attr:`is_leader` changed.
+        """
+        was_leader = self.is_leader
+        self.is_leader = self.lock.acquire()
+        return self.is_leader != was_leader
+
+    def resign(self) -> None:
+        self.lock.release()
+        self.is_leader = False
+
+
+def live_replicas() -> set[str]:
+    """The names of the replicas whose :data:`heartbeat` hasn't expired, this one
+    included."""
+    with Session() as session:
+        return set(
+            session.scalars(
+                select(Lease.holder).where(
+                    Lease.name.startswith(REPLICA_LEASE_PREFIX),
+                    Lease.expires_at >= datetime.now(UTC),
+                )
+            )
+        )
+
+
+def lease(name: str) -> LeaseLock:
+    """The lease :paramref:`name` of this bot, held by this replica."""
+    return LeaseLock(f"{BOT_ID}/{name}", Config.REPLICA_NAME, Config.LEASE_TTL)
+
+
+election = Election(LeaseLock(LEADER_LEASE, Config.REPLICA_NAME, Config.LEASE_TTL))
+
+heartbeat = LeaseLock(
+    REPLICA_LEASE_PREFIX + Config.REPLICA_NAME, Config.REPLICA_NAME, Config.LEASE_TTL
+)
+"""Renewed on every round of the election, and released on shutdown"""
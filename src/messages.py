@@ -3,13 +3,13 @@ import re
 from typing import Optional
 from zoneinfo import ZoneInfo
 
-from babel.dates import format_datetime
 from sqlalchemy.orm import Session
 from telegram import Chat
 
 from src import constants, queries
 from src.constants import LEVELS
 from src.customcontext import CustomContext
+from src.formatting import format_datetime
 from src.models import (
     AccessRequest,
     Assignment,
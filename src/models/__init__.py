@@ -12,18 +12,21 @@ __all__ = (
     "File",
     "HasNumber",
     "Lab",
+    "Lease",
     "Lecture",
     "Material",
     "MaterialType",
     "Program",
     "ProgramSemester",
     "ProgramSemesterCourse",
+    "QueuedUpdate",
     "RefFilesMixin",
     "Reference",
     "Review",
     "Role",
     "RoleName",
     "Semester",
+    "SentMedia",
     "Setting",
     "SettingKey",
     "Sheet",
@@ -31,6 +34,7 @@ __all__ = (
     "Status",
     "Tool",
     "Tutorial",
+    "UpdateCheckpoint",
     "User",
     "UserData",
     "UserOptionalCourse",
@@ -43,7 +47,7 @@ from .base import Base
 from .course import Course
 from .department import Department
 from .enrollment import Enrollment
-from .file import File
+from .file import File, SentMedia
 from .material import (
     Assignment,
     HasNumber,
@@ -59,7 +63,15 @@ from .material import (
     Tool,
     Tutorial,
 )
-from .persistence import BotData, ChatData, Conversation, UserData
+from .persistence import (
+    BotData,
+    ChatData,
+    Conversation,
+    Lease,
+    QueuedUpdate,
+    UpdateCheckpoint,
+    UserData,
+)
 from .program import Program
 from .program_semester import ProgramSemester
 from .program_semester_course import ProgramSemesterCourse
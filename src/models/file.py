@@ -1,6 +1,6 @@
 from typing import TYPE_CHECKING
 
-from sqlalchemy import ForeignKey, String
+from sqlalchemy import JSON, BigInteger, ForeignKey, String
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from .base import Base
@@ -33,3 +33,19 @@ class File(Base):
 
     def __repr__(self) -> str:
         return f"File(id={self.id!r}, type={self.type!r}, name={self.name!r}) "
+
+
+class SentMedia(Base):
+    """Messages a set of files was sent as by "send all", later requests copy them
+    instead of sending the files again. See
+    :func:`src.conversations.material.sendall.send`"""
+
+    __tablename__ = "sent_media"
+
+    id: Mapped[int] = mapped_column(init=False, primary_key=True, autoincrement=True)
+    key: Mapped[str] = mapped_column(String(64), unique=True)
+    chat_id: Mapped[int] = mapped_column(BigInteger)
+    message_ids: Mapped[JSON] = mapped_column(JSON, nullable=False)
+
+    def __repr__(self) -> str:
+        return f"SentMedia(id={self.id!r}, chat_id={self.chat_id!r})"
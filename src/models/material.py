@@ -134,7 +134,11 @@ class Lab(HasId, Material, HasNumber, RefFilesMixin):
 class Assignment(HasId, Material, HasNumber, RefFilesMixin):
     __tablename__ = "assignment"
     deadline: Mapped[datetime] = mapped_column(
-        TIMESTAMP(timezone=True), nullable=True, default=None, sort_order=999
+        TIMESTAMP(timezone=True),
+        nullable=True,
+        default=None,
+        sort_order=999,
+        index=True,
     )
     __mapper_args__: ClassVar[dict[str, MaterialType]] = {
         "polymorphic_identity": MaterialType.ASSIGNMENT
@@ -1,6 +1,17 @@
+from datetime import datetime
 from typing import TYPE_CHECKING
 
-from sqlalchemy import JSON, CheckConstraint, ForeignKey, String, UniqueConstraint
+from sqlalchemy import (
+    JSON,
+    TIMESTAMP,
+    BigInteger,
+    CheckConstraint,
+    ForeignKey,
+    Index,
+    String,
+    UniqueConstraint,
+    func,
+)
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from .base import Base
@@ -16,6 +27,7 @@ class ChatData(Base):
         ForeignKey("user.id"), nullable=False, default=None
     )
     data: Mapped[JSON] = mapped_column(JSON, nullable=False, default=None)
+    version: Mapped[int] = mapped_column(nullable=False, default=1, server_default="1")
 
     user: Mapped["User"] = relationship(default=None, back_populates="chat_data")
 
@@ -30,6 +42,7 @@ class UserData(Base):
         ForeignKey("user.id"), nullable=False, default=None
     )
     data: Mapped[JSON] = mapped_column(JSON, nullable=False, default=None)
+    version: Mapped[int] = mapped_column(nullable=False, default=1, server_default="1")
 
     user: Mapped["User"] = relationship(default=None, back_populates="user_data")
 
@@ -47,6 +60,7 @@ class BotData(Base):
     )
     id: Mapped[int] = mapped_column(init=False, primary_key=True, default=1)
     data: Mapped[JSON] = mapped_column(JSON, nullable=False, default=None)
+    version: Mapped[int] = mapped_column(nullable=False, default=1, server_default="1")
 
     def __repr__(self) -> str:
         return f"BotData(id={self.id!r}, data={self.data!r})"
@@ -54,12 +68,70 @@ class BotData(Base):
 
 class Conversation(Base):
     __tablename__ = "conversation"
-    __table_args__ = (UniqueConstraint("name", "key", name="_name_key_uc"),)
+    __table_args__ = (
+        UniqueConstraint("name", "key", name="_name_key_uc"),
+        # prefix searches for the conversations of a chat, see `SQLPersistence`
+        Index(
+            "conversation_key_idx",
+            "key",
+            postgresql_ops={"key": "varchar_pattern_ops"},
+        ),
+    )
 
     id: Mapped[int] = mapped_column(init=False, primary_key=True, autoincrement=True)
     name: Mapped[str] = mapped_column(String(20), nullable=False)
     key: Mapped[str] = mapped_column(String(100), nullable=False)
     new_state: Mapped[str] = mapped_column(String(100), nullable=True, default=None)
+    version: Mapped[int] = mapped_column(nullable=False, default=1, server_default="1")
 
     def __repr__(self):
         return f"<Conversation (id={self.id})>"
+
+
+class UpdateCheckpoint(Base):
+    """The highest update id received, see :class:`src.ingestion.UpdateWindow`"""
+
+    __tablename__ = "update_checkpoint"
+    __table_args__ = (
+        CheckConstraint(
+            "id = 1",
+            name="id",
+        ),
+    )
+    id: Mapped[int] = mapped_column(init=False, primary_key=True, default=1)
+    update_id: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+
+    def __repr__(self) -> str:
+        return f"UpdateCheckpoint(update_id={self.update_id!r})"
+
+
+class QueuedUpdate(Base):
+    """An update received but not processed yet, see
+    :class:`src.ingestion.DurableUpdateQueue`"""
+
+    __tablename__ = "queued_update"
+
+    id: Mapped[int] = mapped_column(init=False, primary_key=True, autoincrement=True)
+    update_id: Mapped[int] = mapped_column(BigInteger, unique=True)
+    owner: Mapped[str] = mapped_column(String(100), index=True)
+    data: Mapped[JSON] = mapped_column(JSON, nullable=False)
+    received_at: Mapped[datetime] = mapped_column(
+        TIMESTAMP(timezone=True), init=False, server_default=func.now()
+    )
+
+    def __repr__(self) -> str:
+        return f"QueuedUpdate(id={self.id!r}, update_id={self.update_id!r})"
+
+
+class Lease(Base):
+    """Held by the replica :attr:`holder` until :attr:`expires_at` unless renewed,
+    see :class:`src.leader.LeaseLock`"""
+
+    __tablename__ = "lease"
+
+    name: Mapped[str] = mapped_column(String(100), primary_key=True)
+    holder: Mapped[str] = mapped_column(String(100))
+    expires_at: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True))
+
+    def __repr__(self) -> str:
+        return f"Lease(name={self.name!r}, holder={self.holder!r})"
@@ -27,6 +27,9 @@ class SettingKey(enum.Enum):
     ASSIGNMENT = (NOTIFICATION_PREFIX + MaterialType.ASSIGNMENT, True)
     REVIEW = (NOTIFICATION_PREFIX + MaterialType.REVIEW, True)
 
+    # Buffer notifications and send them combined, see `publish.send_digest`
+    DIGEST = ("notification_digest", False)
+
     def __init__(self, key, default=None):
         self.key: str = key
         self.default = default
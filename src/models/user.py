@@ -1,6 +1,7 @@
-from typing import TYPE_CHECKING
+from datetime import datetime
+from typing import TYPE_CHECKING, Optional
 
-from sqlalchemy import BigInteger, String
+from sqlalchemy import TIMESTAMP, BigInteger, String
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from src import constants
@@ -24,6 +25,16 @@ class User(Base):
     language_code: Mapped[str] = mapped_column(
         String(5), nullable=False, default=constants.EN
     )
+    unreachable_since: Mapped[Optional[datetime]] = mapped_column(
+        TIMESTAMP(timezone=True), nullable=True, default=None
+    )
+    """When sending to the user failed with `Forbidden` (blocked the bot or
+    deactivated), `None` while the user is reachable"""
+    commands_hash: Mapped[Optional[str]] = mapped_column(
+        String(64), nullable=True, default=None
+    )
+    """Hash of the command menu last pushed to the user's chat, see
+    `utils.set_my_commands`"""
 
     roles: Mapped[list["Role"]] = relationship(
         default_factory=list,
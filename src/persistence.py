@@ -1,11 +1,12 @@
 import json
 from collections import defaultdict
+from collections.abc import Hashable, Mapping
 from logging import getLogger
 from typing import Optional
 
-from sqlalchemy import select
+from sqlalchemy import or_, select, update
 from sqlalchemy.orm import scoped_session, sessionmaker
-from telegram.ext import DictPersistence, PersistenceInput
+from telegram.ext import ConversationHandler, DictPersistence, PersistenceInput
 
 from src import queries
 from src.database import engine
@@ -13,17 +14,37 @@ from src.models import BotData, ChatData, Conversation, User, UserData
 
 
 class SQLPersistence(DictPersistence):
-    def __init__(
-        self,
-    ) -> None:
+    """Stores bot, user and chat data and conversation states in the database.
+
+    Every row has a version that is bumped on each write. A write is dropped, with
+    a warning, when the row changed since it was last read by this process, so
+    concurrent writers never silently overwrite each other. The row is then stale:
+    further writes to it are dropped as well until it's read again by the next
+    refresh.
+
+    Args:
+        shared (:obj:`bool`, optional): Whether other replicas of the bot use the
+            same database. When set, rows changed by other replicas are read again
+            before they're used, see :meth:`refresh_conversations`.
+    """
+
+    def __init__(self, shared: bool = False) -> None:
 
         self.logger = getLogger(__name__)
+        self.shared = shared
+        self.versions: dict[tuple[Hashable, ...], int] = {}
+        """Version of each row as last read or written, keyed by `("bot",)`,
+        `("user", user_id)`, `("chat", chat_id)` or `("conversation", name, key)`"""
+        self.stale: set[tuple[Hashable, ...]] = set()
+        """Keys of :attr:`versions` whose rows changed since they were last read"""
 
         self.session = scoped_session(sessionmaker(bind=engine, autoflush=False))
         chat_data_json = json.dumps(self._load_chat_data())
         user_data_json = json.dumps(self._load_user_data())
         bot_data_json = json.dumps(self._load_bot_data())
         conversations_json = json.dumps(self._load_conversations())
+        # return the connection to the pool, it's only needed again on writes
+        self.session.remove()
         self.logger.info("Database loaded successfully!")
 
         super().__init__(
@@ -42,6 +63,7 @@ class SQLPersistence(DictPersistence):
             bot_data = BotData(data={})
             self.session.add(bot_data)
             self.session.commit()
+        self.versions["bot",] = bot_data.version
         return bot_data.data
 
     def _load_user_data(self) -> dict:
@@ -49,6 +71,7 @@ class SQLPersistence(DictPersistence):
         user_datas = self.session.query(UserData).all()
         for user_data in user_datas:
             data[user_data.user.telegram_id] = user_data.data
+            self.versions["user", user_data.user.telegram_id] = user_data.version
         return data
 
     def _load_chat_data(self) -> dict:
@@ -56,6 +79,7 @@ class SQLPersistence(DictPersistence):
         chat_datas = self.session.query(ChatData).all()
         for chat_data in chat_datas:
             data[chat_data.user.chat_id] = chat_data.data
+            self.versions["chat", chat_data.user.chat_id] = chat_data.version
         return data
 
     def _load_conversations(self) -> dict:
@@ -67,8 +91,138 @@ class SQLPersistence(DictPersistence):
             data[conversation.name][conversation.key] = json.loads(
                 conversation.new_state
             )
+            self.versions["conversation", conversation.name, conversation.key] = (
+                conversation.version
+            )
         return data
 
+    def _save(self, key: tuple[Hashable, ...], row, **values) -> None:
+        """Write :paramref:`values` to :paramref:`row` unless another replica
+        changed it since it was last read by this process."""
+        version = self.versions.get(key)
+        if key in self.stale or version is None:
+            # Never read, or changed since, by another replica. The refresh reads
+            # it again
+            self.stale.add(key)
+            self.logger.warning("Dropped stale write of %s", key)
+            return
+        model = type(row)
+        result = self.session.execute(
+            update(model)
+            .where(model.id == row.id, model.version == version)
+            .values(version=version + 1, **values)
+        )
+        if result.rowcount:
+            self.versions[key] = version + 1
+        else:
+            self.stale.add(key)
+            self.logger.warning("Dropped stale write of %s", key)
+
+    def _should_refresh(self, key: tuple[Hashable, ...]) -> bool:
+        return self.shared or key in self.stale
+
+    async def refresh_bot_data(self, bot_data: dict) -> None:
+        """Load the bot_data if another replica changed it."""
+        if not self._should_refresh(("bot",)):
+            return
+        row = self.session.execute(
+            select(BotData.data, BotData.version).where(
+                BotData.version != self.versions.get(("bot",), 0)
+            )
+        ).first()
+        self.session.commit()
+        if row is not None:
+            bot_data.clear()
+            bot_data.update(row.data)
+            self.versions["bot",] = row.version
+        self.stale.discard(("bot",))
+
+    async def refresh_user_data(self, user_id: int, user_data: dict) -> None:
+        """Load the user_data of :paramref:`user_id` if another replica changed it."""
+        if not self._should_refresh(("user", user_id)):
+            return
+        row = self.session.execute(
+            select(UserData.data, UserData.version)
+            .join(User)
+            .where(
+                User.telegram_id == user_id,
+                UserData.version != self.versions.get(("user", user_id), 0),
+            )
+        ).first()
+        self.session.commit()
+        if row is not None:
+            user_data.clear()
+            user_data.update(row.data)
+            self.versions["user", user_id] = row.version
+        self.stale.discard(("user", user_id))
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: dict) -> None:
+        """Load the chat_data of :paramref:`chat_id` if another replica changed it."""
+        if not self._should_refresh(("chat", chat_id)):
+            return
+        row = self.session.execute(
+            select(ChatData.data, ChatData.version)
+            .join(User)
+            .where(
+                User.chat_id == chat_id,
+                ChatData.version != self.versions.get(("chat", chat_id), 0),
+            )
+        ).first()
+        self.session.commit()
+        if row is not None:
+            chat_data.clear()
+            chat_data.update(row.data)
+            self.versions["chat", chat_id] = row.version
+        self.stale.discard(("chat", chat_id))
+
+    async def refresh_conversations(
+        self,
+        chat_id: int,
+        user_id: int,
+        handlers: Mapping[str, "PersistentConversationHandler"],
+    ) -> None:
+        """Load the conversation states of a chat that another replica changed.
+
+        Args:
+            chat_id (:obj:`int`): The chat of the update about to be processed.
+            user_id (:obj:`int`): The user of the update about to be processed.
+            handlers (Mapping[:obj:`str`, :obj:`PersistentConversationHandler`]):
+                The persistent conversations by name, their states are updated in
+                place.
+        """
+        if not self.shared:
+            return
+        # Keys start with the chat and user ids, followed by the message id for
+        # per message conversations
+        key_json = json.dumps([chat_id, user_id])
+        rows = self.session.execute(
+            select(
+                Conversation.name,
+                Conversation.key,
+                Conversation.new_state,
+                Conversation.version,
+            ).where(
+                or_(
+                    Conversation.key == key_json,
+                    Conversation.key.startswith(key_json[:-1] + ", "),
+                )
+            )
+        ).all()
+        self.session.commit()
+        for name, key, new_state, version in rows:
+            if (
+                name not in handlers
+                or self.versions.get(("conversation", name, key)) == version
+            ):
+                continue
+            self.versions["conversation", name, key] = version
+            self.stale.discard(("conversation", name, key))
+            state = json.loads(new_state)
+            handlers[name].refresh_state(
+                tuple(json.loads(key)),
+                None if state == ConversationHandler.END else state,
+            )
+
     async def update_bot_data(self, data: dict) -> None:
         """Will update the bot_data (if changed).
 
@@ -79,13 +233,13 @@ class SQLPersistence(DictPersistence):
         bot_data = self.session.query(BotData).first()
 
         if bot_data is None:
-            bot_data = BotData(data={})
+            bot_data = BotData(data=data)
             self.session.add(bot_data)
-
-        if bot_data.data == data:
-            return
-
-        bot_data.data = data
+            self.session.flush()
+            self.versions["bot",] = bot_data.version
+        elif bot_data.data != data:
+            self._save(("bot",), bot_data, data=data)
+        # always end the transaction so the connection goes back to the pool
         self.session.commit()
 
     async def update_user_data(self, user_id: int, data: dict) -> None:
@@ -103,14 +257,13 @@ class SQLPersistence(DictPersistence):
         if user_data is None:
             user_data = UserData(
                 user=queries.user(self.session, telegram_id=user_id),
-                data={},
+                data=data,
             )
             self.session.add(user_data)
-
-        if user_data.data == data:
-            return
-
-        user_data.data = data
+            self.session.flush()
+            self.versions["user", user_id] = user_data.version
+        elif user_data.data != data:
+            self._save(("user", user_id), user_data, data=data)
         self.session.commit()
 
     async def update_chat_data(self, chat_id: int, data: dict) -> None:
@@ -128,14 +281,13 @@ class SQLPersistence(DictPersistence):
         if chat_data is None:
             chat_data = ChatData(
                 user=self.session.scalar(select(User).where(User.chat_id == chat_id)),
-                data={},
+                data=data,
             )
             self.session.add(chat_data)
-
-        if chat_data.data == data:
-            return
-
-        chat_data.data = data
+            self.session.flush()
+            self.versions["chat", chat_id] = chat_data.version
+        elif chat_data.data != data:
+            self._save(("chat", chat_id), chat_data, data=data)
         self.session.commit()
 
     async def update_conversation(
@@ -158,11 +310,23 @@ class SQLPersistence(DictPersistence):
 
         if conv is None:
             conv = Conversation(name=name, key=key_json)
+            conv.new_state = new_state_json
             self.session.add(conv)
+            self.session.flush()
+            self.versions["conversation", name, key_json] = conv.version
+        elif conv.new_state != new_state_json:
+            self._save(("conversation", name, key_json), conv, new_state=new_state_json)
+        self.session.commit()
 
-        if conv.new_state == new_state_json:
-            return
 
-        conv.new_state = new_state_json
+class PersistentConversationHandler(ConversationHandler):
+    """A persistent `ConversationHandler` whose states :class:`SQLPersistence` can
+    update when another replica changed them, see
+    :meth:`SQLPersistence.refresh_conversations`."""
 
-        self.session.commit()
+    __slots__ = ()
+
+    def refresh_state(self, key: tuple[int, ...], state: Optional[object]) -> None:
+        """Set the state of the conversation :paramref:`key` without it being
+        written back on the next flush. `None` ends the conversation."""
+        self._conversations.update_no_track({key: state})
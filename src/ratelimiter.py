@@ -0,0 +1,228 @@
+"""Contains the policy applied to every outgoing Bot API request. It's hooked into
+python-telegram-bot as the `ExtBot.rate_limiter`."""
+
+import asyncio
+import logging
+import time
+from collections.abc import Callable, Coroutine, Mapping
+from typing import Any, Optional, Union
+
+from telegram.error import RetryAfter, TelegramError
+from telegram.ext import BaseRateLimiter
+
+from src.enum import StringEnum
+from src.request import Lane, current_lane
+
+JSONResult = Union[bool, dict[str, Any], list[dict[str, Any]]]
+
+logger = logging.getLogger(__name__)
+
+
+class AckMode(StringEnum):
+    """How acknowledgements (`answerCallbackQuery` and `sendChatAction`) are sent."""
+
+    AWAIT = "await"
+    """Handlers wait for the acknowledgement, the default"""
+    BACKGROUND = "background"
+    """Acknowledgements are sent concurrently with the handler body"""
+
+
+ACK_ENDPOINTS = ("answerCallbackQuery", "sendChatAction")
+
+TELEGRAM_MAX_RATE = 30.0
+"""Messages per second Telegram allows a bot to send, see
+https://core.telegram.org/bots/faq#my-bot-is-hitting-limits-how-do-i-avoid-this"""
+
+
+class TokenBucket:
+    """Lets through at most :attr:`rate` requests per second, with bursts of up to
+    :paramref:`capacity` requests.
+
+    The rate adapts to Telegram's flood control (AIMD): every successful request
+    adds :paramref:`increase` / :attr:`rate` requests per second, so the rate grows
+    by about :paramref:`increase` each second, up to :paramref:`max_rate`. A
+    `RetryAfter` multiplies it by :paramref:`decrease`, down to
+    :paramref:`min_rate`, and pauses the bucket for the advised delay.
+
+    Args:
+        rate (:obj:`float`): Initial requests per second.
+        capacity (:obj:`float`, optional): Defaults to one second worth of requests.
+        min_rate (:obj:`float`, optional): Lower bound of the adapted rate.
+        max_rate (:obj:`float`, optional): Upper bound of the adapted rate.
+        increase (:obj:`float`, optional): Additive increase per second.
+        decrease (:obj:`float`, optional): Multiplicative decrease factor.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: Optional[float] = None,
+        min_rate: float = 0.5,
+        max_rate: float = TELEGRAM_MAX_RATE,
+        increase: float = 0.5,
+        decrease: float = 0.5,
+    ) -> None:
+        self.rate = rate
+        self.capacity = capacity or max(rate, 1.0)
+        self.min_rate = min(min_rate, rate)
+        self.max_rate = max(max_rate, rate)
+        self.increase = increase
+        self.decrease = decrease
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._tokens = min(
+                    self.capacity, self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def on_success(self) -> None:
+        self.rate = min(self.max_rate, self.rate + self.increase / self.rate)
+
+    def on_retry_after(self, seconds: float) -> None:
+        self.rate = max(self.min_rate, self.rate * self.decrease)
+        self._tokens = 0
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+class RateLimiter(BaseRateLimiter[None]):
+    """Decides when and whether outgoing requests are sent.
+
+    Args:
+        ack_mode (:obj:`AckMode`): See :class:`AckMode`.
+        shed_backlog (:obj:`int`, optional): When the number of pending updates
+            reaches this, bare acknowledgements are dropped instead of sent.
+        backlog (Callable[[], :obj:`int`], optional): Returns the number of updates
+            waiting to be processed. Usually `KeyedUpdateProcessor.backlog`, set
+            after the application is built.
+        lane_rates (Mapping[:obj:`Lane`, :obj:`float` | :obj:`None`], optional):
+            Initial requests per second budget of each lane, `None` for no limit.
+            Limited lanes adapt their rate, see :class:`TokenBucket`.
+        max_retries (:obj:`int`, optional): How many times a request is retried
+            after Telegram answers with `RetryAfter`.
+    """
+
+    def __init__(
+        self,
+        ack_mode: AckMode = AckMode.AWAIT,
+        shed_backlog: Optional[int] = None,
+        backlog: Optional[Callable[[], int]] = None,
+        lane_rates: Optional[Mapping[Lane, Optional[float]]] = None,
+        max_retries: int = 3,
+    ) -> None:
+        self.max_retries = max_retries
+        self.buckets = {
+            lane: TokenBucket(rate)
+            for lane, rate in (lane_rates or {}).items()
+            if rate is not None
+        }
+        self.ack_mode = AckMode(ack_mode)
+        self.shed_backlog = shed_backlog
+        self.backlog = backlog
+        self.shed_count = 0
+        self._tasks: set[asyncio.Task] = set()
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def is_overloaded(self) -> bool:
+        return (
+            self.shed_backlog is not None
+            and self.backlog is not None
+            and self.backlog() >= self.shed_backlog
+        )
+
+    async def process_request(
+        self,
+        callback: Callable[..., Coroutine[Any, Any, JSONResult]],
+        args: Any,
+        kwargs: dict[str, Any],
+        endpoint: str,
+        data: dict[str, Any],
+        rate_limit_args: None,
+    ) -> JSONResult:
+        if endpoint not in ACK_ENDPOINTS:
+            return await self._send(callback, args, kwargs, endpoint)
+
+        if is_bare_ack(endpoint, data) and self.is_overloaded():
+            self.shed_count += 1
+            return True
+
+        if self.ack_mode == AckMode.BACKGROUND:
+            # Both endpoints return `True` on success, so the handler doesn't need
+            # to wait for the round trip.
+            task = asyncio.create_task(self._ack(callback, args, kwargs, endpoint))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+            return True
+
+        return await callback(*args, **kwargs)
+
+    async def _send(self, callback, args, kwargs, endpoint: str) -> JSONResult:
+        lane = current_lane.get()
+        bucket = self.buckets.get(lane)
+        for _ in range(self.max_retries):
+            try:
+                return await self._attempt(callback, args, kwargs, bucket)
+            except RetryAfter as error:
+                logger.warning(
+                    "%s hit flood control in the %s lane, retrying in %ss."
+                    " Effective rate is now %s/s",
+                    endpoint,
+                    lane,
+                    error.retry_after,
+                    f"{bucket.rate:.2f}" if bucket else "unlimited",
+                )
+                if not bucket:
+                    await asyncio.sleep(error.retry_after)
+        # The last attempt's `RetryAfter` reaches the caller
+        return await self._attempt(callback, args, kwargs, bucket)
+
+    @staticmethod
+    async def _attempt(
+        callback, args, kwargs, bucket: Optional[TokenBucket]
+    ) -> JSONResult:
+        """Send the request once, through :paramref:`bucket` when the lane has
+        one."""
+        if bucket is None:
+            return await callback(*args, **kwargs)
+        await bucket.acquire()
+        try:
+            result = await callback(*args, **kwargs)
+        except RetryAfter as error:
+            bucket.on_retry_after(error.retry_after)
+            raise
+        bucket.on_success()
+        return result
+
+    async def _ack(self, callback, args, kwargs, endpoint: str) -> None:
+        try:
+            await callback(*args, **kwargs)
+        except TelegramError as error:
+            # e.g. the callback query expired while the ack was queued
+            logger.debug("Background %s failed: %s", endpoint, error)
+
+
+def is_bare_ack(endpoint: str, data: dict[str, Any]) -> bool:
+    """Whether the request carries nothing for the user besides the acknowledgement
+    itself. Callback answers with a text, an alert or a url are not bare."""
+    if endpoint not in ACK_ENDPOINTS:
+        return False
+    return not any(data.get(key) for key in ("text", "show_alert", "url"))
@@ -0,0 +1,97 @@
+"""Contains the request layer used by the bot to talk to the Bot API.
+
+Outgoing requests are classified into priority lanes. Each lane has its own
+connection pool, so bulk fan-outs can't starve interactive replies of
+connections, and its own rate budget, see :mod:`src.ratelimiter`.
+"""
+
+import asyncio
+from collections.abc import Mapping
+from contextvars import ContextVar
+from functools import wraps
+from typing import Optional
+
+from telegram._utils.defaultvalue import DEFAULT_NONE
+from telegram._utils.types import ODVInput
+from telegram.request import BaseRequest, HTTPXRequest, RequestData
+
+from src.enum import StringEnum
+
+
+class Lane(StringEnum):
+    INTERACTIVE = "interactive"
+    """Replies to user input, the default"""
+    NOTIFICATION = "notification"
+    """Publish notifications and deadline reminders"""
+    BULK = "bulk"
+    """Broadcasts and any other job, see `CustomContext.from_job`"""
+
+
+current_lane: ContextVar[Lane] = ContextVar("current_lane", default=Lane.INTERACTIVE)
+"""The lane of requests made from the current task"""
+
+
+def lane(lane_: Lane):
+    """Run the decorated callback with all its requests sent through
+    :paramref:`lane_`."""
+
+    def decorator(callback):
+        @wraps(callback)
+        async def wrapped(*args, **kwargs):
+            token = current_lane.set(lane_)
+            try:
+                return await callback(*args, **kwargs)
+            finally:
+                current_lane.reset(token)
+
+        return wrapped
+
+    return decorator
+
+
+class LaneRequest(BaseRequest):
+    """Dispatches every request to the :class:`HTTPXRequest` of
+    :data:`current_lane`.
+
+    Args:
+        pool_sizes (Mapping[:obj:`Lane`, :obj:`int`]): Connection pool size of
+            each lane.
+    """
+
+    __slots__ = ("_requests",)
+
+    def __init__(self, pool_sizes: Mapping[Lane, int]) -> None:
+        self._requests = {
+            lane_: HTTPXRequest(connection_pool_size=pool_sizes[lane_])
+            for lane_ in Lane
+        }
+
+    @property
+    def read_timeout(self) -> Optional[float]:
+        return self._requests[Lane.INTERACTIVE].read_timeout
+
+    async def initialize(self) -> None:
+        await asyncio.gather(*(r.initialize() for r in self._requests.values()))
+
+    async def shutdown(self) -> None:
+        await asyncio.gather(*(r.shutdown() for r in self._requests.values()))
+
+    async def do_request(
+        self,
+        url: str,
+        method: str,
+        request_data: Optional[RequestData] = None,
+        read_timeout: ODVInput[float] = DEFAULT_NONE,
+        write_timeout: ODVInput[float] = DEFAULT_NONE,
+        connect_timeout: ODVInput[float] = DEFAULT_NONE,
+        pool_timeout: ODVInput[float] = DEFAULT_NONE,
+    ) -> tuple[int, bytes]:
+        return await self._requests[current_lane.get()].do_request(
+            url,
+            method,
+            request_data=request_data,
+            read_timeout=read_timeout,
+            write_timeout=write_timeout,
+            connect_timeout=connect_timeout,
+            pool_timeout=pool_timeout,
+        )
@@ -0,0 +1,176 @@
+"""Contains the router callback queries go through before the conversations.
+
+Callback data starts with the prefix of the conversation it belongs to, like
+`constants.NOTIFICATION_`, and `CallbackQueryHandler` patterns are matched from
+the start of the data. :class:`CallbackRouter` indexes the literal prefix of every
+pattern in a trie, so a callback query is only checked by the conversations that
+have a pattern it can match, instead of by each conversation in turn.
+"""
+
+import re
+from collections.abc import Iterable, Sequence
+from typing import Any, Optional
+
+from telegram import Update
+from telegram.ext import (
+    BaseHandler,
+    CallbackQueryHandler,
+    CommandHandler,
+    ConversationHandler,
+    MessageHandler,
+)
+
+SPECIAL_CHARS = frozenset(".^$*+?{}[]\\|()")
+QUANTIFIERS = frozenset("*+?{")
+GROUP_START = re.compile(r"\((?:\?:|\?P<\w+>)?")
+
+
+def has_top_level_branch(pattern: str) -> bool:
+    """Whether :paramref:`pattern` is an alternation of whole patterns, like
+    `a|b`, whose branches don't share a prefix."""
+    depth = 0
+    in_set = False
+    escaped = False
+    for char in pattern:
+        if escaped:
+            escaped = False
+        elif char == "\\":
+            escaped = True
+        elif in_set:
+            in_set = char != "]"
+        elif char == "[":
+            in_set = True
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "|" and depth == 0:
+            return True
+    return False
+
+
+def literal_prefixes(pattern: str) -> set[str]:
+    """The text every string :paramref:`pattern` matches with `re.match` starts
+    with, one for each branch of a leading group like `(uma|edp)`. Errs on the
+    short side, `""` when nothing is known."""
+    pattern = pattern.removeprefix("^")
+    if has_top_level_branch(pattern):
+        return {""}
+    end = 0
+    while end < len(pattern) and pattern[end] not in SPECIAL_CHARS:
+        end += 1
+    head = pattern[:end]
+    if end < len(pattern) and pattern[end] in QUANTIFIERS:
+        # The quantifier makes the last character optional or repeatable
+        return {head[:-1]}
+    if (group := GROUP_START.match(pattern, end)) and (
+        close := pattern.find(")", group.end())
+    ) != -1:
+        branches = pattern[group.end() : close].split("|")
+        rest = pattern[close + 1 :]
+        if not any(SPECIAL_CHARS.intersection(branch) for branch in branches) and (
+            not rest or rest[0] not in QUANTIFIERS
+        ):
+            return {
+                head + branch + prefix
+                for branch in branches
+                for prefix in literal_prefixes(rest)
+            }
+    return {head}
+
+
+def callback_prefixes(handler: BaseHandler) -> set[str]:
+    """The literal prefixes of the callback data :paramref:`handler` can handle.
+    Empty for handlers that never handle callback queries, `""` stands for any
+    data."""
+    if isinstance(handler, ConversationHandler):
+        handlers: Iterable[BaseHandler] = [
+            *handler.entry_points,
+            *(h for state in handler.states.values() for h in state),
+            *handler.fallbacks,
+        ]
+        return set().union(*map(callback_prefixes, handlers))
+    if isinstance(handler, (CommandHandler, MessageHandler)):
+        return set()
+    if (
+        isinstance(handler, CallbackQueryHandler)
+        and isinstance(handler.pattern, re.Pattern)
+        and not handler.pattern.flags & re.IGNORECASE
+    ):
+        return literal_prefixes(handler.pattern.pattern)
+    return {""}
+
+
+class _Node:
+    __slots__ = ("children", "conversations")
+
+    def __init__(self) -> None:
+        self.children: dict[str, _Node] = {}
+        self.conversations: set[int] = set()
+        """Indices of the conversations with a pattern ending at this node"""
+
+
+class CallbackRouter(BaseHandler[Update, Any]):
+    """Hands callback queries to the first of :paramref:`conversations` that can
+    handle them, checking only those whose patterns share a prefix with the
+    data.
+
+    It must be added to the same group as :paramref:`conversations`, right before
+    them, and they must be the rest of the group. They still handle every other
+    update, and are what persistence tracks. Callback queries none of them can
+    handle are taken by the router as well, so the group doesn't check them all
+    again.
+
+    Args:
+        conversations (Sequence[:obj:`ConversationHandler`]): In the order they
+            are added to the group.
+    """
+
+    __slots__ = ("_root", "conversations")
+
+    def __init__(self, conversations: Sequence[ConversationHandler]) -> None:
+        # The update is handled by the conversation, see `handle_update`
+        super().__init__(callback=None, block=True)
+        self.conversations = list(conversations)
+        self._root = _Node()
+        for index, conversation in enumerate(self.conversations):
+            for prefix in callback_prefixes(conversation):
+                node = self._root
+                for char in prefix:
+                    node = node.children.setdefault(char, _Node())
+                node.conversations.add(index)
+
+    def candidates(self, data: str) -> list[ConversationHandler]:
+        """The conversations that can handle a callback query with
+        :paramref:`data`, in order."""
+        node = self._root
+        indices = set(node.conversations)
+        for char in data:
+            node = node.children.get(char)
+            if node is None:
+                break
+            indices.update(node.conversations)
+        return [self.conversations[index] for index in sorted(indices)]
+
+    def check_update(
+        self, update: object
+    ) -> Optional[tuple[Optional[ConversationHandler], object]]:
+        if not (isinstance(update, Update) and update.callback_query):
+            return None
+        for conversation in self.candidates(update.callback_query.data or ""):
+            check = conversation.check_update(update)
+            if not (check is None or check is False):
+                return conversation, check
+        return None, None
+
+    async def handle_update(
+        self,
+        update: Update,
+        application,
+        check_result: tuple[Optional[ConversationHandler], object],
+        context,
+    ) -> object:
+        conversation, check = check_result
+        if conversation is None:
+            return None
+        return await conversation.handle_update(update, application, check, context)
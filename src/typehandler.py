@@ -5,7 +5,7 @@ from telegram.ext import ContextTypes, TypeHandler
 from src import constants, queries
 from src.config import Config
 from src.models import RoleName, User
-from src.utils import session, set_my_commands
+from src.utils import mark_reachable, session, set_my_commands
 
 
 @session
@@ -47,6 +47,13 @@ async def register_user(
 
         await set_my_commands(update.get_bot(), user)
 
+    # The user interacted with us, so they can be reached again. A conditional
+    # update rather than a flag in `user_data`, which `mark_unreachable` can't
+    # write reliably from outside the user's updates, often on another replica
+    mark_reachable(session, context.user_data["id"])
+    # The flag older versions kept in `user_data` instead
+    context.user_data.pop("unreachable", None)
+
     if (user := update.effective_user) and context.user_data.get(
         "full_name"
     ) != user.full_name:
@@ -1,19 +1,23 @@
+import hashlib
+import json
 import math
+from collections.abc import Iterable, Mapping, Sequence
 from datetime import timedelta
 from functools import wraps
 from gettext import GNUTranslations
-from typing import Generic, TypeVar
+from typing import Any, Generic, Optional, TypeVar
 
-from babel.dates import format_timedelta
-from sqlalchemy import select
+from sqlalchemy import func, select, update
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session as SessionType
 from telegram import Bot, BotCommandScopeChat, InlineKeyboardButton, Update
 from telegram.constants import ChatAction
 from telegram.ext import ContextTypes
 
-from src import constants
+from src import cache, constants
 from src.constants import Commands
 from src.database import Session
+from src.formatting import format_timedelta
 from src.models import Role, RoleName, Setting, SettingKey, User, user_role
 
 
@@ -36,15 +40,28 @@ def send_action(action):
 send_typing_action = send_action(ChatAction.TYPING)
 
 
-def session(callback):
-    @wraps(callback)
-    async def wrapped(
-        update: Update, context: ContextTypes.DEFAULT_TYPE, *args, **kwargs
-    ):
-        with Session.begin() as session:
-            return await callback(update, context, *args, **kwargs, session=session)
+def session(callback=None, *, read_only: bool = False):
+    """Run the callback inside a database transaction, passing the session as the
+    `session` keyword argument.
 
-    return wrapped
+    Can be used both as ``@session`` and as ``@session(read_only=True)``. Read-only
+    transactions are routed to the replica database when one is configured, and
+    must only be used by handlers that never write.
+    """
+
+    def decorator(callback):
+        @wraps(callback)
+        async def wrapped(
+            update: Update, context: ContextTypes.DEFAULT_TYPE, *args, **kwargs
+        ):
+            with Session(info={"read_only": read_only}) as session, session.begin():
+                return await callback(update, context, *args, **kwargs, session=session)
+
+        return wrapped
+
+    if callback is None:
+        return decorator
+    return decorator(callback)
 
 
 def roles(roles: RoleName):
@@ -169,9 +186,146 @@ def set_setting_value(
             value=value,
         )
         user.settings.append(setting)
+    cache.settings.pop(user_id)
     return setting
 
 
+def get_setting_values(
+    session: SessionType,
+    user_id: int,
+    setting_keys: Optional[Iterable[SettingKey]] = None,
+    use_cache: bool = False,
+) -> dict[SettingKey, Any]:
+    """
+    Read many settings of a user with a single query.
+
+    Args:
+        session (:obj:`Session`): An `sqlalchemy.orm.Session` instance.
+        user_id (:obj:`int`): The user id.
+        setting_keys (Iterable[:obj:`SettingKey`], optional): The settings to read.
+            Defaults to all settings.
+        use_cache (:obj:`bool`, optional): Serve the values from
+            :data:`src.cache.settings` when present, and populate it otherwise.
+
+    Returns:
+        dict[:obj:`SettingKey`, Any]: The stored value of each setting, or its
+        default when the user never changed it.
+    """
+    if setting_keys is None:
+        setting_keys = [
+            s for s in SettingKey if s is not SettingKey.NOTIFICATION_PREFIX
+        ]
+
+    stored = cache.settings.get(user_id) if use_cache else None
+    if stored is None:
+        stored = dict(
+            session.execute(
+                select(Setting.key, Setting.value).where(Setting.user_id == user_id)
+            ).all()
+        )
+        if use_cache:
+            cache.settings.set(user_id, stored)
+
+    return {
+        setting_key: (
+            value
+            if (value := stored.get(setting_key.key)) is not None
+            else setting_key.default
+        )
+        for setting_key in setting_keys
+    }
+
+
+def set_setting_values(
+    session: SessionType, user_id: int, values: Mapping[SettingKey, Any]
+) -> None:
+    """
+    Insert or update many settings of a user in a single statement.
+
+    Args:
+        session (:obj:`Session`): An `sqlalchemy.orm.Session` instance.
+        user_id (:obj:`int`): The user id.
+        values (Mapping[:obj:`SettingKey`, Any]): The new value of each setting.
+    """
+    if not values:
+        return
+    dialect = session.get_bind().dialect.name
+    if dialect == "postgresql":
+        insert = postgresql.insert
+    elif dialect == "sqlite":
+        insert = sqlite.insert
+    else:
+        for setting_key, value in values.items():
+            set_setting_value(session, user_id, setting_key, value)
+        return
+
+    statement = insert(Setting).values(
+        [
+            {"user_id": user_id, "key": setting_key.key, "value": value}
+            for setting_key, value in values.items()
+        ]
+    )
+    session.execute(
+        statement.on_conflict_do_update(
+            index_elements=[Setting.user_id, Setting.key],
+            set_={"value": statement.excluded.value},
+        )
+    )
+    cache.settings.pop(user_id)
+
+
+def users_setting_value(
+    session: SessionType, user_ids: Sequence[int], setting_key: SettingKey
+) -> dict[int, Any]:
+    """
+    Read a single setting of many users with a single query. Meant for
+    notification fan-outs.
+
+    Args:
+        session (:obj:`Session`): An `sqlalchemy.orm.Session` instance.
+        user_ids (Sequence[:obj:`int`]): The user ids.
+        setting_key (:obj:`SettingKey`): The setting to read.
+
+    Returns:
+        dict[:obj:`int`, Any]: The setting value of each user id, or the setting
+        default when the user never changed it.
+    """
+    stored = dict(
+        session.execute(
+            select(Setting.user_id, Setting.value).where(
+                Setting.user_id.in_(user_ids), Setting.key == setting_key.key
+            )
+        ).all()
+    )
+    return {
+        user_id: (
+            value if (value := stored.get(user_id)) is not None else setting_key.default
+        )
+        for user_id in user_ids
+    }
+
+
+def mark_unreachable(session: SessionType, user_id: int):
+    """Record that sending to a user failed with `Forbidden`, which excludes them
+    from broadcasts, notifications and reminders until they interact with the bot
+    again, see :func:`mark_reachable`."""
+    session.execute(
+        update(User)
+        .where(User.id == user_id, User.unreachable_since.is_(None))
+        .values(unreachable_since=func.now())
+    )
+
+
+def mark_reachable(session: SessionType, user_id: int):
+    """Undo :func:`mark_unreachable`. Runs on every update of the user, and only
+    writes when they were marked."""
+    session.execute(
+        update(User)
+        .where(User.id == user_id, User.unreachable_since.is_not(None))
+        .values(unreachable_since=None)
+    )
+
+
 def build_menu(
     buttons: list[InlineKeyboardButton],
     n_cols: int,
@@ -205,30 +359,32 @@ def build_media_group(
 
 
 async def set_my_commands(bot: Bot, user: User):
-    role_names = [r.name for r in user.roles]
+    """Push the command menu of :paramref:`user`'s roles and language to their
+    chat, unless it's the menu pushed last. Records it in `User.commands_hash`, so
+    it must be called in the transaction :paramref:`user` was loaded in."""
     role_names = {r.name for r in user.roles}
     translation = user_locale(user.language_code)
     commands = Commands(translation.gettext)
 
     if role_names == {RoleName.USER}:
-        await bot.set_my_commands(
-            commands.user_commands(), scope=BotCommandScopeChat(user.chat_id)
-        )
+        menu = commands.user_commands()
     elif role_names == {RoleName.USER, RoleName.ROOT}:
-        await bot.set_my_commands(
-            commands.root_commands(),
-            scope=BotCommandScopeChat(user.chat_id),
-        )
+        menu = commands.root_commands()
     elif role_names == {RoleName.USER, RoleName.STUDENT}:
-        await bot.set_my_commands(
-            commands.student_commands(),
-            scope=BotCommandScopeChat(user.chat_id),
-        )
+        menu = commands.student_commands()
     elif role_names == {RoleName.USER, RoleName.STUDENT, RoleName.EDITOR}:
-        await bot.set_my_commands(
-            commands.editor_commands(),
-            scope=BotCommandScopeChat(user.chat_id),
-        )
+        menu = commands.editor_commands()
+    else:
+        return
+
+    # The translated menu covers both the roles and the language
+    commands_hash = hashlib.sha256(
+        json.dumps([command.to_dict() for command in menu]).encode()
+    ).hexdigest()
+    if user.commands_hash == commands_hash:
+        return
+    await bot.set_my_commands(menu, scope=BotCommandScopeChat(user.chat_id))
+    user.commands_hash = commands_hash
 
 
 T = TypeVar("T")